@@ -3,9 +3,11 @@
 # ------------------------------------------------------------
 
 import numpy as np
-import matplotlib.pyplot as plt
 import cmath
 
+from fir_filter import FIRFilter
+from freq_response import freq_response
+
 def freq_sampling_Hilbert(k):
   '''
   discrete Hilbert transform filter by frequency sampling method
@@ -24,29 +26,90 @@ def freq_sampling_Hilbert(k):
   H_sampled[k+1] = H_sampled[2*k] = complex(0, 1 - trans_err)
 
   # inverse discrete Fourier transform
-  n = np.arange(N)
-  m = np.arange(N).reshape(N, 1)
-  r_matrix = H_sampled.reshape(N, 1) * np.exp(complex(0, 1) * 2 * np.pi * m * n / N)
-  r = np.sum(r_matrix, axis=0) / N
+  r = np.fft.ifft(H_sampled)
 
   # return impulse response
   h = np.hstack((r[k+1:], r[:k+1]))
   return h
 
+# impulse responses of freq_sampling_Hilbert, cached by k
+hilbert_cache = {}
+
+def cached_Hilbert(k):
+  if k not in hilbert_cache:
+    hilbert_cache[k] = freq_sampling_Hilbert(k)
+  return hilbert_cache[k].copy()
+
+class AnalyticSignal:
+  '''
+  streaming analytic signal z[n] = x[n-k] + j (h * x)[n]
+  h is the Hilbert transform filter of length 2k+1 (real part of
+  freq_sampling_Hilbert(k)), its group delay is k samples, so the real
+  branch is delayed by k samples to line up with the imaginary branch
+  chunks of any size (along the last axis, e.g. (channels, samples)) are
+  processed with constant memory; outputs lag the input by k samples
+  '''
+  def __init__(self, k=16):
+    self.k = k
+    self.fir = FIRFilter(cached_Hilbert(k).real)
+    self.reset()
+
+  def reset(self):
+    self.fir.reset()
+    self.delay = None      # last k input samples
+    self.last_phase = None # for unwrapping the phase across chunks
+
+  def process(self, x):
+    # returns the analytic signal of the chunk
+    x = np.asarray(x, dtype=float)
+    if self.delay is None or self.delay.shape[:-1] != x.shape[:-1]:
+      self.delay = np.zeros(x.shape[:-1] + (self.k,))
+    ext = np.concatenate((self.delay, x), axis=-1)
+    self.delay = ext[..., x.shape[-1]:]
+    return ext[..., :x.shape[-1]] + complex(0, 1) * self.fir.process(x)
+
+  def envelope(self, x):
+    # returns the envelope |z| of the chunk
+    return np.abs(self.process(x))
+
+  def phase(self, x):
+    # returns the instantaneous phase of the chunk, unwrapped across chunks
+    z = self.process(x)
+    if self.last_phase is None:
+      self.last_phase = np.angle(z[..., :1]) if z.shape[-1] else None
+    if self.last_phase is None:
+      return np.angle(z)
+    phase = np.unwrap(np.concatenate((self.last_phase, np.angle(z)), axis=-1))[..., 1:]
+    if phase.shape[-1]:
+      self.last_phase = phase[..., -1:]
+    return phase
+
+def analytic_stream(chunks, k=16, output='analytic'):
+  '''
+  generator of the analytic signal / envelope / instantaneous phase
+  of an unbounded stream of chunks
+  output: 'analytic', 'envelope' or 'phase'
+  '''
+  analytic = AnalyticSignal(k)
+  step = {'analytic': analytic.process, 'envelope': analytic.envelope,
+          'phase': analytic.phase}[output]
+  for chunk in chunks:
+    yield step(chunk)
+
 if __name__ == "__main__":
+  import matplotlib.pyplot as plt
+
   # parameters
   k = 8
   N = 2 * k + 1
   fs = 1e4
 
   n = np.arange(N)
-  F = np.linspace(0, 1, int(fs), endpoint=False)
 
   # get impulse response h[n] and calculate DTFT (centered at n=0)
   h = freq_sampling_Hilbert(k)
-  m = np.arange(N).reshape(N, 1) - k # centered at n = 0
-  H_matrix = h.real.reshape(N, 1) * np.exp(complex(0, -1) * 2 * np.pi * F * m)
-  H = np.sum(H_matrix, axis=0)
+  resp = freq_response(h.real, n_fft=int(fs), center=k, whole=True)
+  F, H = resp.F, resp.H
 
   # plot results
   plt.figure()
@@ -3,9 +3,9 @@
 # ----------------------------------------------------------------------
 
 import numpy as np
-import cv2
 import math
 import json
+import struct
 
 # ------------------------------------------------------------
 # BGR to YCbCr conversion / perform 4:2:2 or 4:2:0
@@ -466,10 +466,329 @@ def JPEG_extract(data, code, dim, mode):
 
   return img
 
+# ------------------------------------------------------------
+# encoder context for streams of same-sized frames
+# ------------------------------------------------------------
+# JPEG standard of 50% compression quantization table (as in qtz)
+qtz_table = np.array([
+  [16, 11, 10, 16, 24, 40, 51, 61],
+  [12, 12, 14, 19, 26, 58, 60, 55],
+  [14, 13, 16, 24, 40, 57, 69, 56],
+  [14, 17, 22, 29, 51, 87, 80, 62],
+  [18, 22, 37, 56, 68,109,103, 77],
+  [24, 35, 55, 64, 81,104,113, 92],
+  [49, 64, 78, 87,103,121,120,101],
+  [72, 92, 95, 98,112,100,103, 99]
+])
+
+def aligned_empty(shape, dtype=float, align=64):
+  # uninitialized array whose data starts on an align-byte boundary
+  dtype = np.dtype(dtype)
+  size = int(np.prod(shape)) * dtype.itemsize
+  raw = np.empty(size + align, dtype=np.uint8)
+  offset = -raw.ctypes.data % align
+  return raw[offset:offset+size].view(dtype).reshape(shape)
+
+def dct_matrix():
+  # D[u, m] = C[u] / 2 cos((2m+1) u pi / 16), so the 8x8 DCT of dct8x8
+  # is D X D^T and the inverse of idct8x8 is D^T X D
+  C = np.ones(8)
+  C[0] = 1 / math.sqrt(2)
+  u = np.arange(8).reshape(8, 1)
+  m = np.arange(8)
+  return C.reshape(8, 1) / 2 * np.cos((2 * m + 1) * u * np.pi / 16)
+
+def upsample_pairs(lo, hi, out, temp):
+  # out = (lo + hi) / 2, through temp since lo, hi, out are views of
+  # one array (numpy would copy overlapping inputs)
+  temp = temp[:out.shape[0], :out.shape[1]]
+  np.add(lo, hi, out=temp)
+  np.multiply(temp, 0.5, out=out)
+
+class JPEGPlane:
+  '''
+  work buffers of one (l, w) plane of JPEGCodec, all allocated once
+  blocks are kept as (block rows, block columns, 8, 8) arrays
+  '''
+  def __init__(self, l, w):
+    self.l, self.w = l, w
+    self.bh, self.bw = -(-l // 8), -(-w // 8)
+    self.nb = self.bh * self.bw
+    # zero padding minus 128, as dct8x8; the inside is written by encode
+    self.pad = aligned_empty((self.bh * 8, self.bw * 8))
+    self.pad.fill(-128)
+    self.rec = aligned_empty((self.bh * 8, self.bw * 8))
+    self.blocks = aligned_empty((self.bh, self.bw, 8, 8))
+    self.temp = aligned_empty((self.bh, self.bw, 8, 8))
+    self.q = aligned_empty((self.bh, self.bw, 8, 8))
+    self.dc = aligned_empty((self.bh, self.bw))
+    self.ac = aligned_empty((self.nb, 63))
+    self.nonzero = np.empty((self.nb, 63), dtype=bool)
+    self.keep = np.empty((self.nb, 63), dtype=bool)
+    self.any = np.empty(self.nb, dtype=bool)
+    self.sizes = np.empty(self.nb, dtype=np.intp)
+    self.starts = np.empty(self.nb, dtype=np.intp)
+    self.row = np.empty(self.nb * 63, dtype=np.intp)
+    self.index = np.empty(self.nb * 63, dtype=np.intp)
+    self.positions = np.arange(self.nb * 63)
+
+  def block_view(self, plane):
+    # (block rows, block columns, 8, 8) view of a padded plane
+    return plane.reshape(self.bh, 8, self.bw, 8).transpose(0, 2, 1, 3)
+
+  def forward(self, D, order):
+    # DCT, quantization, differential DC, zigzag AC with end of block
+    np.copyto(self.blocks, self.block_view(self.pad))
+    np.matmul(D, self.blocks, out=self.temp)
+    np.matmul(self.temp, D.T, out=self.blocks)
+    np.floor_divide(self.blocks, qtz_table, out=self.q)
+
+    dc = self.q[:, :, 0, 0]
+    self.dc[:, 0] = dc[:, 0]
+    np.subtract(dc[:, 1:], dc[:, :-1], out=self.dc[:, 1:])
+
+    np.take(self.q.reshape(self.nb, 64), order, axis=1, out=self.ac, mode='clip')
+    # size = last non-zero position + 1, at least 1 (as zigzag)
+    np.not_equal(self.ac, 0, out=self.nonzero)
+    np.argmax(self.nonzero[:, ::-1], axis=1, out=self.sizes)
+    np.subtract(63, self.sizes, out=self.sizes)
+    np.logical_or.reduce(self.nonzero, axis=1, out=self.any)
+    np.logical_not(self.any, out=self.any)
+    np.copyto(self.sizes, 1, where=self.any)
+
+  def kept_index(self):
+    '''
+    flat index in ac of the first sizes[i] AC terms of every block i
+    built from the sizes without boolean indexing, so nothing is allocated
+    '''
+    count = int(self.sizes.sum())
+    np.cumsum(self.sizes, out=self.starts)
+    np.subtract(self.starts, self.sizes, out=self.starts)
+    # block of every kept term: 1 at the start of every block, summed up
+    row = self.row[:count]
+    row.fill(0)
+    np.put(row, self.starts[1:], 1)
+    np.cumsum(row, out=row)
+    # position in the block
+    index = self.index[:count]
+    np.take(self.starts, row, out=index, mode='clip')
+    np.subtract(self.positions[:count], index, out=index)
+    np.multiply(row, 63, out=row)
+    np.add(index, row, out=index)
+    return index
+
+  def gather(self, out):
+    # kept AC terms of all blocks into out, returns their number
+    index = self.kept_index()
+    np.take(self.ac.reshape(-1), index, out=out[:index.size], mode='clip')
+    return index.size
+
+  def inverse(self, D, order, dc_diff, ac_data):
+    # rebuild the quantized blocks, inverse quantization and DCT into rec
+    np.cumsum(dc_diff.reshape(self.bh, self.bw), axis=1, out=self.dc)
+    np.less(self.positions[:63], self.sizes.reshape(-1, 1), out=self.keep)
+    self.ac.fill(0)
+    np.place(self.ac, self.keep, ac_data)
+    q = self.q.reshape(self.nb, 64)
+    q[:, order] = self.ac
+    self.q[:, :, 0, 0] = self.dc
+
+    np.multiply(self.q, qtz_table, out=self.blocks)
+    np.matmul(D.T, self.blocks, out=self.temp)
+    np.matmul(self.temp, D, out=self.blocks)
+    np.copyto(self.block_view(self.rec), self.blocks)
+    np.add(self.rec, 128, out=self.rec)
+
+class JPEGCodec:
+  '''
+  JPEG_compress / JPEG_extract for a stream of frames of one size
+  all work buffers are allocated (64-byte aligned) when the codec is
+  created, and every stage works in place on them, so encode / decode
+  allocate nothing proportional to the frame after the first call
+  l, w: frame height and width
+  mode: 444, 422 or 420, as ycbcr_compress
+  encode(frame) returns bytes: the DC differences and the zigzag AC
+  terms of Y, Cb, Cr as in JPEG_compress, coded by the rank of every
+  value in the frequency-sorted code table (as Huffman_enc)
+  decode(data) returns the (l, w, 3) int16 BGR image in an internal
+  buffer, overwritten by the next decode
+  '''
+  header = struct.Struct('<4sHHHHI') # magic, l, w, mode, codes, symbols
+  max_value = 4096                   # |DC difference|, |AC| of 8-bit images
+
+  def __init__(self, l, w, mode=420):
+    self.l, self.w, self.mode = l, w, mode
+    self.row_step, self.col_step = {420: (2, 2), 422: (2, 1)}.get(mode, (1, 1))
+    self.cbl = -(-l // self.row_step)
+    self.cbw = -(-w // self.col_step)
+    self.D = dct_matrix()
+    self.order = np.array(zigzag(np.arange(64).reshape(8, 8)))
+
+    self.planes = [JPEGPlane(l, w), JPEGPlane(self.cbl, self.cbw),
+                   JPEGPlane(self.cbl, self.cbw)]
+    blocks = sum(plane.nb for plane in self.planes)
+    self.max_symbols = blocks * 64
+    self.stream = aligned_empty(self.max_symbols)
+    self.index = np.empty(self.max_symbols, dtype=np.intp)
+    self.ranks = np.empty(self.max_symbols, dtype=np.uint16)
+    self.symbols = np.empty(self.max_symbols, dtype=np.int16)
+    self.rank_of = np.empty(2 * self.max_value, dtype=np.uint16)
+    self.sizes = np.empty(blocks, dtype=np.uint8)
+    self.out = bytearray(self.header.size + 4 * self.max_value + blocks
+                         + 2 * self.max_symbols)
+
+    self.y = aligned_empty((l, w))
+    self.temp = aligned_empty((l, w))
+    self.cb_rc = aligned_empty((l, w))
+    self.cr_rc = aligned_empty((l, w))
+    self.b = aligned_empty((l, w))
+    self.g = aligned_empty((l, w))
+    self.r = aligned_empty((l, w))
+    self.row_avg = aligned_empty((l // 2, w // 2))
+    self.col_avg = aligned_empty((l // 2, w // 2))
+    self.bgr = aligned_empty((l, w, 3), dtype='int16')
+
+  def encode(self, frame):
+    if frame.shape != (self.l, self.w, 3):
+      raise ValueError(f'frame should have shape {(self.l, self.w, 3)}')
+    y, cb, cr = self.planes
+    rs, cs = self.row_step, self.col_step
+
+    # BGR to YCbCr (as ycbcr_compress), written into the padded planes
+    np.multiply(frame[:,:,2], 0.299, out=self.y)
+    np.multiply(frame[:,:,1], 0.587, out=self.temp)
+    np.add(self.y, self.temp, out=self.y)
+    np.multiply(frame[:,:,0], 0.114, out=self.temp)
+    np.add(self.y, self.temp, out=self.y)
+    np.subtract(self.y, 128, out=y.pad[:y.l, :y.w])
+    for plane, channel, scale in ((cb, 0, 0.565), (cr, 2, 0.713)):
+      inside = plane.pad[:plane.l, :plane.w]
+      np.subtract(frame[::rs, ::cs, channel], self.y[::rs, ::cs], out=inside)
+      np.multiply(inside, scale, out=inside)
+      np.subtract(inside, 128, out=inside)
+
+    # DC differences of Y, Cb, Cr, then AC terms of Y, Cb, Cr
+    n = 0
+    for plane in self.planes:
+      plane.forward(self.D, self.order)
+      self.stream[n:n+plane.nb] = plane.dc.reshape(-1)
+      n += plane.nb
+    k = 0
+    for plane in self.planes:
+      n += plane.gather(self.stream[n:])
+      self.sizes[k:k+plane.nb] = plane.sizes
+      k += plane.nb
+
+    # code table: values sorted by frequency, every value coded by its rank
+    index = self.index[:n]
+    np.copyto(index, self.stream[:n], casting='unsafe')
+    np.add(index, self.max_value, out=index)
+    if n and (index.min() < 0 or index.max() >= 2 * self.max_value):
+      raise ValueError('coefficient out of range')
+    counts = np.bincount(index, minlength=2 * self.max_value)
+    codes = int(np.count_nonzero(counts))
+    table = np.argsort(-counts, kind='stable')[:codes]
+    self.rank_of[table] = np.arange(codes)
+    ranks = self.ranks[:n]
+    np.take(self.rank_of, index, out=ranks, mode='clip')
+
+    # write the bytes
+    width = 1 if codes <= 256 else 2
+    self.header.pack_into(self.out, 0, b'PJPG', self.l, self.w, self.mode, codes, n)
+    offset = self.header.size
+    view = np.frombuffer(self.out, dtype='<i2', count=codes, offset=offset)
+    np.subtract(table, self.max_value, out=view, casting='unsafe')
+    offset += 2 * codes
+    view = np.frombuffer(self.out, dtype=np.uint8, count=self.sizes.size, offset=offset)
+    view[:] = self.sizes
+    offset += self.sizes.size
+    view = np.frombuffer(self.out, dtype='<u2' if width == 2 else np.uint8,
+                         count=n, offset=offset)
+    np.copyto(view, ranks, casting='unsafe')
+    offset += width * n
+    return bytes(memoryview(self.out)[:offset])
+
+  def decode(self, data):
+    magic, l, w, mode, codes, n = self.header.unpack_from(data, 0)
+    if magic != b'PJPG' or (l, w, mode) != (self.l, self.w, self.mode):
+      raise ValueError(f'data is not a {self.l}x{self.w} {self.mode} frame')
+    width = 1 if codes <= 256 else 2
+    offset = self.header.size
+    table = np.frombuffer(data, dtype='<i2', count=codes, offset=offset)
+    offset += 2 * codes
+    sizes = np.frombuffer(data, dtype=np.uint8, count=self.sizes.size, offset=offset)
+    offset += self.sizes.size
+    ranks = np.frombuffer(data, dtype='<u2' if width == 2 else np.uint8,
+                          count=n, offset=offset)
+    stream = self.stream[:n]
+    np.copyto(self.index[:n], ranks) # take would convert the index itself
+    np.take(table, self.index[:n], out=self.symbols[:n], mode='clip')
+    np.copyto(stream, self.symbols[:n])
+
+    dc_start, ac_start, k = 0, sum(plane.nb for plane in self.planes), 0
+    for plane in self.planes:
+      plane.sizes[:] = sizes[k:k+plane.nb]
+      count = int(plane.sizes.sum())
+      plane.inverse(self.D, self.order, stream[dc_start:dc_start+plane.nb],
+                    stream[ac_start:ac_start+count])
+      dc_start += plane.nb
+      ac_start += count
+      k += plane.nb
+
+    # restore cb, cr (as ycbcr_recover) and the BGR image
+    y = self.planes[0].rec[:self.l, :self.w]
+    for plane, rc in ((self.planes[1], self.cb_rc), (self.planes[2], self.cr_rc)):
+      self.upsample(plane.rec[:plane.l, :plane.w], rc)
+    np.divide(self.cb_rc, 0.565, out=self.b)
+    np.add(self.b, y, out=self.b)
+    np.divide(self.cr_rc, 0.713, out=self.r)
+    np.add(self.r, y, out=self.r)
+    np.multiply(self.r, 0.299, out=self.temp)
+    np.subtract(y, self.temp, out=self.g)
+    np.multiply(self.b, 0.114, out=self.temp)
+    np.subtract(self.g, self.temp, out=self.g)
+    np.divide(self.g, 0.587, out=self.g)
+    for channel, values in enumerate((self.b, self.g, self.r)):
+      np.copyto(self.bgr[:,:,channel], values, casting='unsafe')
+    return self.bgr
+
+  def upsample(self, c, rc):
+    # vectorized chroma restoration of ycbcr_recover
+    l, w = self.l, self.w
+    if self.mode == 420:
+      rc[::2, ::2] = c
+      # odd rows, even columns: average of the rows above and below
+      upsample_pairs(rc[0:l-2:2, ::2], rc[2:l:2, ::2], rc[1:l-1:2, ::2], self.temp)
+      if l % 2 == 0:
+        rc[l-1, ::2] = rc[l-2, ::2]
+      # even rows, odd columns: average of the columns on both sides
+      upsample_pairs(rc[::2, 0:w-2:2], rc[::2, 2:w:2], rc[::2, 1:w-1:2], self.temp)
+      if w % 2 == 0:
+        rc[::2, w-1] = rc[::2, w-2]
+      # odd rows, odd columns: average of the row and column averages
+      rows, cols = l // 2, w // 2
+      row_avg, col_avg = self.row_avg, self.col_avg
+      upsample_pairs(rc[0:l-2:2, 1::2], rc[2:l:2, 1::2], row_avg[:(l-1)//2], self.temp)
+      if l % 2 == 0:
+        row_avg[rows-1] = rc[l-2, 1::2]
+      upsample_pairs(rc[1::2, 0:w-2:2], rc[1::2, 2:w:2], col_avg[:, :(w-1)//2], self.temp)
+      if w % 2 == 0:
+        col_avg[:, cols-1] = rc[1::2, w-2]
+      upsample_pairs(row_avg, col_avg, rc[1::2, 1::2], self.temp)
+    elif self.mode == 422:
+      rc[::2, :] = c
+      upsample_pairs(rc[0:l-2:2], rc[2:l:2], rc[1:l-1:2], self.temp)
+      if l % 2 == 0:
+        rc[l-1] = rc[l-2]
+    else: # mode = 444, no compression
+      rc[:] = c
+
 # ------------------------------------------------------------
 # test
 # ------------------------------------------------------------
 if __name__ == '__main__':
+  import cv2
+
   # boolean variables for different tests
   # test progress:
   # - YCbCr compression: pass
@@ -4,14 +4,22 @@
 
 import random
 import numpy as np
-import cv2
+
+L = 255   # 255 for images
+
+def SSIM_formula(u_A, u_B, var_A, var_B, covar, c1, c2):
+  # structural similarity from the means, variances and covariance
+  num1 = 2 * u_A * u_B + (c1 * L) ** 2
+  num2 = 2 * covar + (c2 * L) ** 2
+  den1 = u_A ** 2 + u_B ** 2 + (c1 * L) ** 2
+  den2 = var_A + var_B + (c2 * L) ** 2
+  return num1 * num2 / (den1 * den2)
 
 def SSIM(A, B, c1, c2):
   '''
   returns the structural similarity of A, B
   c1, c2 are adjustable constants
   '''
-  L = 255   # 255 for images
 
   # check if A, B have the same dimension
   if not np.shape(A) == np.shape(B):
@@ -29,14 +37,72 @@ def SSIM(A, B, c1, c2):
   covar = np.mean((A - u_A) * (B - u_B))
 
   # compute SSIM
-  num1 = 2 * u_A * u_B + (c1 * L) ** 2
-  num2 = 2 * covar + (c2 * L) ** 2
-  den1 = u_A ** 2 + u_B ** 2 + (c1 * L) ** 2
-  den2 = var_A + var_B + (c2 * L) ** 2
-  SSIM_result = num1 * num2 / (den1 * den2)
-  return SSIM_result
+  return SSIM_formula(u_A, u_B, var_A, var_B, covar, c1, c2)
+
+# ------------------------------------------------------------
+# SSIM in the 8x8 DCT domain
+# ------------------------------------------------------------
+
+def dct_blocks(X, shape=None):
+  '''
+  (block rows, block columns, 8, 8) view of 8x8 DCT coefficients
+  shape: (l, w) of the image, to keep only the blocks without padding
+  '''
+  X = np.asarray(X, dtype=float)
+  if X.ndim != 4:
+    l, w = X.shape
+    X = X.reshape(l // 8, 8, w // 8, 8).transpose(0, 2, 1, 3)
+  if shape is not None:
+    X = X[:shape[0] // 8, :shape[1] // 8]
+  return X
+
+def dct_moments(X, Y, shape=None):
+  '''
+  mean, variance of every block of X, Y and their covariance
+  the 8x8 DCT of JPEG is orthonormal and applied to pixels - 128, so
+    mean = DC / 8 + 128
+    sum of squared pixel deviations = sum of squared AC terms
+  '''
+  X, Y = dct_blocks(X, shape), dct_blocks(Y, shape)
+  if X.shape != Y.shape:
+    raise ValueError('X, Y should have the same size for computing SSIM.')
+  X_dc, Y_dc = X[:, :, 0, 0], Y[:, :, 0, 0]
+  u_X = X_dc / 8 + 128
+  u_Y = Y_dc / 8 + 128
+  var_X = (np.einsum('ijkl,ijkl->ij', X, X) - X_dc ** 2) / 64
+  var_Y = (np.einsum('ijkl,ijkl->ij', Y, Y) - Y_dc ** 2) / 64
+  covar = (np.einsum('ijkl,ijkl->ij', X, Y) - X_dc * Y_dc) / 64
+  return u_X, u_Y, var_X, var_Y, covar
+
+def SSIM_dct_blocks(X, Y, c1, c2, shape=None):
+  '''
+  structural similarity of every 8x8 block, from the DCT coefficients
+  X, Y (as dct8x8, or (block rows, block columns, 8, 8) arrays),
+  e.g. the coefficients of an image and the dequantized ones of JPEG
+  shape: (l, w) of the image, to leave out the zero padded edge blocks
+  returns a (block rows, block columns) array
+  '''
+  return SSIM_formula(*dct_moments(X, Y, shape), c1, c2)
+
+def SSIM_dct(X, Y, c1, c2, shape=None):
+  '''
+  SSIM of the images with the DCT coefficients X, Y without the inverse
+  DCT: the same value as SSIM on the (zero padded) pixels, since
+    variance = mean of the block variances + variance of the block means
+  and the same for the covariance
+  shape: (l, w) of the image; if given, the zero padded edge blocks are
+         left out, i.e. SSIM of the pixels [:l//8*8, :w//8*8]
+  '''
+  u_X, u_Y, var_X, var_Y, covar = dct_moments(X, Y, shape)
+  U_X, U_Y = np.mean(u_X), np.mean(u_Y)
+  VAR_X = np.mean(var_X) + np.mean((u_X - U_X) ** 2)
+  VAR_Y = np.mean(var_Y) + np.mean((u_Y - U_Y) ** 2)
+  COVAR = np.mean(covar) + np.mean((u_X - U_X) * (u_Y - U_Y))
+  return SSIM_formula(U_X, U_Y, VAR_X, VAR_Y, COVAR, c1, c2)
 
 if __name__ == '__main__':
+  import cv2
+
   # for testing, prepare any image, place it in the same directory 
   # as the SSIM.py file, and change the path below
   img_path = './cat.jpg'
@@ -66,6 +132,18 @@ if __name__ == '__main__':
   print(f'SSIM for adding noises: {SSIM(img1, img_noise, 1/16, 1/16)}')
   print(f'SSIM for a random image: {SSIM(img1, img_ran, 1/16, 1/16)}')
 
+  # SSIM of the JPEG luma from the DCT coefficients, without inverse DCT
+  from JPEG import ycbcr_compress, dct8x8, idct8x8, qtz
+  y, _, _ = ycbcr_compress(img1.astype(float), 420)
+  y_dct = dct8x8(y)
+  y_iq = qtz(qtz(y_dct), inverse=True)
+  y_rec = idct8x8(y_iq, *y.shape)
+  l8, w8 = y.shape[0] // 8 * 8, y.shape[1] // 8 * 8 # blocks without padding
+  print(f'SSIM of JPEG luma (DCT domain): {SSIM_dct(y_dct, y_iq, 1/16, 1/16, y.shape)}')
+  print(f'SSIM of JPEG luma (pixels): {SSIM(y[:l8, :w8], y_rec[:l8, :w8], 1/16, 1/16)}')
+  blocks = SSIM_dct_blocks(y_dct, y_iq, 1/16, 1/16, y.shape)
+  print(f'block SSIM: mean {np.mean(blocks)}, worst {np.min(blocks)}')
+
   cv2.imshow('original image', img1)
   cv2.imshow('image with different brightness', img2)
   cv2.imshow('image with random noise', img_noise)
@@ -0,0 +1,156 @@
+# ------------------------------------------------------------
+# Performance regression benchmark of the whole library
+# synthetic inputs, headless, compared with a JSON baseline
+# ------------------------------------------------------------
+
+import numpy as np
+import io
+import os
+import sys
+import argparse
+import tempfile
+import contextlib
+
+import JPEG
+from SSIM import SSIM, SSIM_dct
+from mini_max import design_mini_max
+from Hilbert_transform_fs import freq_sampling_Hilbert
+from ntt_mat import NTTm
+from number_music import numbers_to_music
+from dft_benchmark import time_function, save_results, compare_results, same_file
+
+def quiet(f):
+  # run f without its progress messages
+  def run(*args):
+    with contextlib.redirect_stdout(io.StringIO()):
+      return f(*args)
+  return run
+
+def synthetic_image(size, seed=0):
+  # smooth gradients plus noise, so the JPEG stages see realistic blocks
+  rng = np.random.default_rng(seed)
+  i, j = np.mgrid[:size, :size]
+  img = np.empty((size, size, 3))
+  img[:,:,0] = 128 + 60 * np.sin(i / 9) * np.cos(j / 13)
+  img[:,:,1] = 2 * (i + j) * 255 / (4 * size)
+  img[:,:,2] = 255 - img[:,:,1]
+  img += rng.normal(0, 8, img.shape)
+  return np.clip(img, 0, 255).astype(np.uint8)
+
+def jpeg_cases(size, seed=0):
+  '''
+  every stage of JPEG_compress / JPEG_extract on a size x size image
+  the inputs of every stage are the outputs of the previous one
+  '''
+  img = synthetic_image(size, seed)
+  mode = 420
+  y, cb, cr = JPEG.ycbcr_compress(img, mode)
+  y_dct = JPEG.dct8x8(y)
+  y_q = JPEG.qtz(y_dct)
+  blocks = [y_q[i:i+8, j:j+8] for i in range(0, y_q.shape[0], 8)
+                              for j in range(0, y_q.shape[1], 8)]
+  zz = [JPEG.zigzag(block) for block in blocks]
+  data, code, dim, _ = quiet(JPEG.JPEG_compress)(img)
+  # as stored in and loaded from the json file
+  data = list(map(int, data))
+  code = {str(key): value for key, value in code.items()}
+  codec = JPEG.JPEGCodec(size, size, mode)
+  frame = codec.encode(img)
+
+  return {
+    'jpeg_ycbcr_compress': (img.size, lambda: JPEG.ycbcr_compress(img, mode)),
+    'jpeg_dct8x8': (y.size, lambda: JPEG.dct8x8(y)),
+    'jpeg_qtz': (y.size, lambda: JPEG.qtz(y_dct)),
+    'jpeg_diff_enc': (y.size, lambda: JPEG.diff_enc(y_q[::8, ::8])),
+    'jpeg_zigzag': (y.size, lambda: [JPEG.zigzag(block) for block in blocks]),
+    'jpeg_huffman_enc': (y_q.size, lambda: JPEG.Huffman_enc(y_q)),
+    'jpeg_compress': (img.size, lambda: quiet(JPEG.JPEG_compress)(img)),
+    'jpeg_huffman_dec': (len(data), lambda: JPEG.Huffman_dec(data, code)),
+    'jpeg_inv_zigzag': (y.size, lambda: [JPEG.inv_zigzag(seq, 8) for seq in zz]),
+    'jpeg_idct8x8': (y.size, lambda: JPEG.idct8x8(y_dct, *y.shape)),
+    'jpeg_ycbcr_recover': (img.size, lambda: JPEG.ycbcr_recover(y, cb, cr, mode)),
+    'jpeg_extract': (img.size, lambda: quiet(JPEG.JPEG_extract)(data, code, dim, mode)),
+    'jpeg_codec_encode': (img.size, lambda: codec.encode(img)),
+    'jpeg_codec_decode': (img.size, lambda: codec.decode(frame)),
+  }
+
+def other_cases(size, seed=0):
+  rng = np.random.default_rng(seed)
+  A = rng.integers(0, 256, (size, size)).astype(float)
+  B = np.clip(A + rng.normal(0, 10, A.shape), 0, 255)
+  # coefficients of A and the dequantized ones of its JPEG
+  A_dct = JPEG.dct8x8(A)
+  B_dct = JPEG.qtz(JPEG.qtz(A_dct), inverse=True)
+
+  score = list(rng.integers(0, 15, 120))
+  beat = [1] * 120
+  chord = [[1, 3, 5], [1, 4, 6]] * 15
+  chord_beat = [4] * 30
+  music_dir = tempfile.TemporaryDirectory() # removed with the closure
+  def music():
+    name = os.path.join(music_dir.name, 'benchmark')
+    quiet(numbers_to_music)(score, beat, name, 180, 524, chord, chord_beat,
+                            0.5, 22050, 'int16')
+
+  return {
+    'ssim': (A.size, lambda: SSIM(A, B, 0.01, 0.03)),
+    'ssim_dct': (A.size, lambda: SSIM_dct(A_dct, B_dct, 0.01, 0.03)),
+    'mini_max': (33, lambda: design_mini_max(33, [0, 0.2], [0.2, 0.25],
+                                             {'pass': 1, 'stop': 0.6}, 1e-4)),
+    'freq_sampling_hilbert': (33, lambda: freq_sampling_Hilbert(16)),
+    'nttm': (16, lambda: NTTm(16, 17)),
+    'numbers_to_music': (120 * int(60 / 180 * 22050), music),
+  }
+
+def run_suite(size=64, repeat=5, warmup=1, names=None, seed=0):
+  '''
+  size: side of the synthetic images
+  names: benchmarks to run, all by default
+  return: list of result dictionaries ('method' is the benchmark name,
+          'N' the input size, as in dft_benchmark)
+  '''
+  cases = jpeg_cases(size, seed)
+  cases.update(other_cases(size, seed))
+  results = []
+  for name, (n, f) in cases.items():
+    if names and name not in names:
+      continue
+    t_best, t_median, peak = time_function(lambda _: f(), None, repeat, warmup)
+    results.append({
+      'method': name,
+      'N': n,
+      'time_best': t_best,
+      'time_median': t_median,
+      'peak_memory': peak,
+    })
+    print(f'{name:>22} N={n:<8}: {t_best * 1e3:10.3f} ms  '
+          f'(median {t_median * 1e3:10.3f} ms)  {peak / 2**20:8.2f} MiB')
+  return results
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='library performance regression benchmark')
+  parser.add_argument('names', nargs='*', help='benchmarks to run, all by default')
+  parser.add_argument('--size', type=int, default=64, help='side of the test images')
+  parser.add_argument('--repeat', type=int, default=5)
+  parser.add_argument('--warmup', type=int, default=1)
+  parser.add_argument('--output', default='benchmark_suite.json')
+  parser.add_argument('--baseline', default=None,
+                      help='json file of a previous run to compare with')
+  parser.add_argument('--threshold', type=float, default=0.1,
+                      help='allowed relative slowdown when comparing')
+  args = parser.parse_args()
+  if args.baseline is not None and same_file(args.baseline, args.output):
+    parser.error('--output would overwrite the --baseline file, '
+                 'save the results to another file')
+
+  results = run_suite(args.size, args.repeat, args.warmup, args.names)
+  save_results(results, args.output)
+  print(f'results saved to {args.output}')
+  if args.baseline is not None:
+    # non-zero exit status on regressions or unmatched benchmarks, for scripts and CI
+    if compare_results(args.baseline, results, args.threshold, args.names):
+      sys.exit(1)
+
+# ------------------------------
+# end
+# ------------------------------
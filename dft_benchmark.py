@@ -0,0 +1,170 @@
+# ------------------------------------------------------------
+# Benchmark of DFT implementations over a sweep of lengths
+# prime_factor_dft vs direct DFT vs numpy.fft
+# ------------------------------------------------------------
+
+import numpy as np
+import os
+import time
+import json
+import platform
+import argparse
+import tracemalloc
+
+from prime_factor_dft import prime_factor_dft
+
+# lengths of the sweep, grouped by structure
+sweep_lengths = {
+  'prime': [101, 257, 509, 1009, 2003],
+  'prime_power': [243, 343, 625, 729, 1024, 2187],
+  'coprime_product': [105, 1155, 3500, 5005, 15015],
+  'highly_composite': [360, 720, 2520, 5040, 10080],
+}
+
+def direct_dft(x):
+  # O(N^2) DFT by the complete DFT matrix
+  N = x.size
+  m = np.arange(N)
+  n = np.arange(N).reshape(N, 1)
+  X_matrix = x.reshape(N, 1) * np.exp(complex(0,-1) * 2 * np.pi * m * n / N)
+  return np.sum(X_matrix, axis=0) # sum along n axis
+
+def time_function(f, x, repeat, warmup):
+  '''
+  returns the best and median time (s) of f(x) over repeat runs
+  and the peak memory (bytes) of one run
+  '''
+  # warm-up runs also build the cached transform plans
+  for _ in range(warmup):
+    f(x)
+
+  times = []
+  for _ in range(repeat):
+    t1 = time.perf_counter()
+    f(x)
+    t2 = time.perf_counter()
+    times.append(t2 - t1)
+
+  # measure memory separately; tracing slows down the timed runs
+  tracemalloc.start()
+  f(x)
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  return min(times), float(np.median(times)), peak
+
+def run_sweep(lengths=None, repeat=5, warmup=1, direct_max=2048, seed=0):
+  '''
+  benchmark every method on every length of the sweep
+  lengths: dictionary of category -> list of lengths
+  direct_max: the direct DFT is skipped for longer lengths (O(N^2) memory)
+  return: list of result dictionaries
+  '''
+  if lengths is None:
+    lengths = sweep_lengths
+  methods = {
+    'prime_factor_dft': prime_factor_dft,
+    'direct_dft': direct_dft,
+    'numpy_fft': np.fft.fft,
+  }
+  rng = np.random.default_rng(seed)
+
+  results = []
+  for category, Ns in lengths.items():
+    for N in Ns:
+      x = rng.random(N) * 100
+      X_ref = np.fft.fft(x)
+      for name, f in methods.items():
+        if name == 'direct_dft' and N > direct_max:
+          continue
+        t_best, t_median, peak = time_function(f, x, repeat, warmup)
+        error = np.max(np.abs(f(x) - X_ref))
+        results.append({
+          'category': category,
+          'N': N,
+          'method': name,
+          'time_best': t_best,
+          'time_median': t_median,
+          'throughput': N / t_best, # samples per second
+          'peak_memory': peak,
+          'max_error': float(error),
+        })
+        print(f'{category:>16} N={N:<6} {name:>16}: '
+              f'{t_best * 1e3:10.3f} ms  {N / t_best / 1e6:8.3f} MS/s  '
+              f'{peak / 2**20:8.2f} MiB  err {error:.2e}')
+  return results
+
+def save_results(results, path):
+  data = {
+    'python': platform.python_version(),
+    'numpy': np.__version__,
+    'machine': platform.machine(),
+    'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+    'results': results,
+  }
+  with open(path, 'w') as f:
+    json.dump(data, f, indent=2)
+
+def same_file(path, other):
+  # whether writing other would overwrite path (e.g. the baseline)
+  return os.path.exists(path) and os.path.exists(other) and os.path.samefile(path, other)
+
+def compare_results(old_path, results, threshold=0.1, names=None):
+  '''
+  compare results with a saved json file
+  returns the (N, method) pairs whose best time grows more than threshold,
+  and the pairs found in only one of the two runs (e.g. another size was
+  measured), which cannot be checked
+  names: methods that were run, the others of the saved file are ignored
+         (all by default)
+  '''
+  with open(old_path) as f:
+    old = json.load(f)
+  old_times = {(r['N'], r['method']): r['time_best'] for r in old['results']
+               if not names or r['method'] in names}
+  new_keys = {(r['N'], r['method']) for r in results}
+
+  regressions = []
+  for r in results:
+    key = (r['N'], r['method'])
+    if key not in old_times:
+      regressions.append(key)
+      print(f'missing: N={key[0]} {key[1]} is not in {old_path}')
+      continue
+    ratio = r['time_best'] / old_times[key]
+    if ratio > 1 + threshold:
+      regressions.append(key)
+      print(f'regression: N={key[0]} {key[1]} is {ratio:.2f}x slower')
+  for key in old_times:
+    if key not in new_keys:
+      regressions.append(key)
+      print(f'missing: N={key[0]} {key[1]} of {old_path} was not measured')
+  if not regressions:
+    print('no regressions found')
+  return regressions
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='DFT length-sweep benchmark')
+  parser.add_argument('--repeat', type=int, default=5)
+  parser.add_argument('--warmup', type=int, default=1)
+  parser.add_argument('--direct-max', type=int, default=2048,
+                      help='skip the direct DFT above this length')
+  parser.add_argument('--output', default='dft_benchmark.json')
+  parser.add_argument('--compare', default=None,
+                      help='json file of a previous run to compare with')
+  parser.add_argument('--threshold', type=float, default=0.1,
+                      help='allowed relative slowdown when comparing')
+  args = parser.parse_args()
+  if args.compare is not None and same_file(args.compare, args.output):
+    parser.error('--output would overwrite the --compare file')
+
+  results = run_sweep(repeat=args.repeat, warmup=args.warmup,
+                      direct_max=args.direct_max)
+  save_results(results, args.output)
+  print(f'results saved to {args.output}')
+  if args.compare is not None:
+    compare_results(args.compare, results, args.threshold)
+
+# ------------------------------
+# end
+# ------------------------------
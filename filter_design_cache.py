@@ -0,0 +1,201 @@
+# ------------------------------------------------------------
+# Design cache for mini-max and Hilbert transform filters
+# in-memory LRU + optional on-disk .npz store + parallel batch design
+# ------------------------------------------------------------
+
+import numpy as np
+import os
+import json
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from mini_max import design_mini_max, MiniMaxResult
+from Hilbert_transform_fs import freq_sampling_Hilbert
+
+def canonical_spec(spec):
+  '''
+  normalize a design spec so equal designs get equal keys
+  spec: {'type': 'mini_max', 'length', 'passbd', 'transbd', 'weight',
+         'analog_intv', optional 'grid', 'seed'}
+        or {'type': 'hilbert', 'k'}
+  '''
+  if spec['type'] == 'hilbert':
+    return {'type': 'hilbert', 'k': int(spec['k'])}
+  return {
+    'type': 'mini_max',
+    'length': int(spec['length']),
+    'passbd': [float(f) for f in spec['passbd']],
+    'transbd': [float(f) for f in spec['transbd']],
+    'weight': {'pass': float(spec['weight']['pass']),
+               'stop': float(spec['weight']['stop'])},
+    'analog_intv': float(spec['analog_intv']),
+    'grid': spec.get('grid', 'dense'),
+    # None (a random start on every call) is a key of its own
+    'seed': None if spec.get('seed', 0) is None else int(spec.get('seed', 0)),
+  }
+
+def spec_hash(spec):
+  text = json.dumps(canonical_spec(spec), sort_keys=True)
+  return hashlib.sha256(text.encode()).hexdigest()
+
+def design_spec(spec):
+  # solve one design; top level so it can run in worker processes
+  spec = canonical_spec(spec)
+  if spec['type'] == 'hilbert':
+    return freq_sampling_Hilbert(spec['k'])
+  args = {key: value for key, value in spec.items() if key != 'type'}
+  return design_mini_max(**args)
+
+class DesignCache:
+  '''
+  memoization of filter designs keyed on the canonicalized spec
+  maxsize: number of designs kept in memory (least recently used dropped)
+  cache_dir: directory of the on-disk store (one .npz per spec hash),
+             None for memory only
+  '''
+  def __init__(self, maxsize=128, cache_dir=None):
+    self.maxsize = maxsize
+    self.cache_dir = cache_dir
+    self.memory = OrderedDict()
+    self.hits = 0
+    self.disk_hits = 0
+    self.misses = 0
+    if cache_dir is not None:
+      os.makedirs(cache_dir, exist_ok=True)
+
+  def path(self, key):
+    return os.path.join(self.cache_dir, f'{key}.npz')
+
+  def remember(self, key, result):
+    # results are shared by every hit, so their arrays are made read-only
+    for taps in (getattr(result, 'taps', result),
+                 getattr(result, 'extremal_freqs', None)):
+      if taps is not None:
+        taps.flags.writeable = False
+    self.memory[key] = result
+    self.memory.move_to_end(key)
+    while len(self.memory) > self.maxsize:
+      self.memory.popitem(last=False)
+
+  def load(self, key):
+    if self.cache_dir is None or not os.path.exists(self.path(key)):
+      return None
+    with np.load(self.path(key)) as f:
+      spec = json.loads(str(f['spec']))
+      if spec['type'] == 'hilbert':
+        return f['taps']
+      args = {k: v for k, v in spec.items() if k != 'type'}
+      return MiniMaxResult(f['taps'], float(f['ripple']), int(f['iterations']),
+                           f['history'].tolist(), f['extremal_freqs'], args)
+
+  def store(self, key, spec, result):
+    if self.cache_dir is None:
+      return
+    spec = json.dumps(canonical_spec(spec), sort_keys=True)
+    # write to a temporary file first, so readers never see half a file
+    temp = os.path.join(self.cache_dir, f'{key}.tmp.npz')
+    if isinstance(result, MiniMaxResult):
+      np.savez(temp, spec=spec, taps=result.taps, ripple=result.ripple,
+               iterations=result.iterations, history=np.array(result.history),
+               extremal_freqs=result.extremal_freqs)
+    else:
+      np.savez(temp, spec=spec, taps=result)
+    os.replace(temp, self.path(key))
+
+  def lookup(self, spec):
+    # cached result of spec or None; counts hits and misses
+    key = spec_hash(spec)
+    if key in self.memory:
+      self.hits += 1
+      self.memory.move_to_end(key)
+      return self.memory[key]
+    result = self.load(key)
+    if result is not None:
+      self.disk_hits += 1
+      self.remember(key, result)
+      return result
+    self.misses += 1
+    return None
+
+  def add(self, spec, result):
+    key = spec_hash(spec)
+    self.remember(key, result)
+    self.store(key, spec, result)
+
+  def design(self, spec):
+    result = self.lookup(spec)
+    if result is None:
+      result = design_spec(spec)
+      self.add(spec, result)
+    return result
+
+  def mini_max(self, length, passbd, transbd, weight, analog_intv,
+               grid='dense', seed=0):
+    # cached design_mini_max, returns MiniMaxResult
+    return self.design({'type': 'mini_max', 'length': length, 'passbd': passbd,
+                        'transbd': transbd, 'weight': weight,
+                        'analog_intv': analog_intv, 'grid': grid, 'seed': seed})
+
+  def hilbert(self, k):
+    # cached freq_sampling_Hilbert, returns the impulse response
+    return self.design({'type': 'hilbert', 'k': k})
+
+  def batch(self, specs, workers=None):
+    '''
+    design a list of specs, solving the cache misses in a process pool
+    workers: number of processes, os.cpu_count() by default
+    return: list of results in the order of specs
+    '''
+    results = [self.lookup(spec) for spec in specs]
+
+    # solve every distinct missing spec once
+    missing = OrderedDict()
+    for i, spec in enumerate(specs):
+      if results[i] is None:
+        missing.setdefault(spec_hash(spec), []).append(i)
+    if missing:
+      todo = [specs[idx[0]] for idx in missing.values()]
+      if len(todo) == 1 or workers == 1:
+        solved = [design_spec(spec) for spec in todo]
+      else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+          solved = list(executor.map(design_spec, todo))
+      for spec, result, idx in zip(todo, solved, missing.values()):
+        self.add(spec, result)
+        for i in idx:
+          results[i] = result
+    return results
+
+if __name__ == '__main__':
+  import time
+  import tempfile
+
+  specs = [
+    {'type': 'mini_max', 'length': length, 'passbd': [0, 0.2],
+     'transbd': [0.2, 0.25], 'weight': {'pass': 1, 'stop': 0.6},
+     'analog_intv': 1e-4}
+    for length in (17, 33, 65, 129)
+  ] + [{'type': 'hilbert', 'k': k} for k in (8, 16, 32)]
+
+  with tempfile.TemporaryDirectory() as cache_dir:
+    cache = DesignCache(cache_dir=cache_dir)
+    t1 = time.perf_counter()
+    first = cache.batch(specs)
+    t2 = time.perf_counter()
+    print(f'cold batch: {t2 - t1:.3f} s')
+
+    # a new cache on the same directory, as at a service restart
+    cache = DesignCache(cache_dir=cache_dir)
+    t1 = time.perf_counter()
+    second = cache.batch(specs)
+    t2 = time.perf_counter()
+    print(f'warm batch (disk): {t2 - t1:.3f} s, {cache.disk_hits} disk hits')
+
+    same = all(np.array_equal(getattr(a, 'taps', a), getattr(b, 'taps', b))
+               for a, b in zip(first, second))
+    print(f'identical designs: {same}')
+
+# ------------------------------
+# end
+# ------------------------------
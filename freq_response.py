@@ -0,0 +1,155 @@
+# ------------------------------------------------------------
+# Frequency response of FIR filters
+# zero-padded FFT on a dense grid, chirp-z transform for zoomed bands
+# ------------------------------------------------------------
+
+import numpy as np
+import hashlib
+from collections import OrderedDict, namedtuple
+
+# F: normalized frequencies (cycles per sample)
+# H: complex frequency response, one row per filter
+# magnitude, phase (unwrapped), group_delay (samples): same shape as H
+FreqResponse = namedtuple('FreqResponse',
+  ['F', 'H', 'magnitude', 'phase', 'group_delay'])
+
+# responses cached by (taps hash, grid), least recently used dropped
+response_cache = OrderedDict()
+response_cache_size = 64
+
+def cache_key(h, grid):
+  digest = hashlib.sha1(np.ascontiguousarray(h).tobytes()).hexdigest()
+  return (digest, h.shape, h.dtype.str, grid)
+
+def cached(h, grid, compute):
+  # look up / store a result computed by compute(); results are read-only
+  key = cache_key(h, grid)
+  if key in response_cache:
+    response_cache.move_to_end(key)
+    return response_cache[key]
+  result = compute()
+  result.flags.writeable = False
+  response_cache[key] = result
+  while len(response_cache) > response_cache_size:
+    response_cache.popitem(last=False)
+  return result
+
+def dtft(h, n_fft, center=0, whole=False, cache=True):
+  '''
+  H(F) = sum_n h[n] exp(-j 2 pi F (n - center)) at F = m / n_fft
+  by zero-padded FFT, for every row of h (taps along the last axis)
+  whole: m = 0 ... n_fft-1, otherwise m = 0 ... n_fft//2 (F in [0, 0.5])
+  cache: keep the result for the next call with the same taps and grid
+  taps longer than n_fft are folded modulo n_fft (exact at these F, where
+  exp(-j 2 pi F n) has period n_fft), as the FFT would cut them off
+  '''
+  h = np.asarray(h)
+  def compute():
+    x = h
+    if x.shape[-1] > n_fft:
+      r = -(-x.shape[-1] // n_fft)
+      pad = [(0, 0)] * (x.ndim - 1) + [(0, r * n_fft - x.shape[-1])]
+      x = np.pad(x, pad).reshape(x.shape[:-1] + (r, n_fft)).sum(axis=-2)
+    if whole:
+      H = np.fft.fft(x, n_fft)
+    elif np.iscomplexobj(x):
+      H = np.fft.fft(x, n_fft)[..., :n_fft // 2 + 1]
+    else:
+      H = np.fft.rfft(x, n_fft)
+    if center:
+      m = np.arange(H.shape[-1])
+      H = H * np.exp(complex(0, 2) * np.pi * ((m * center) % n_fft) / n_fft)
+    return H
+  if not cache:
+    return compute()
+  return cached(h, ('dtft', n_fft, center, whole), compute)
+
+def czt_band(h, f_start, f_stop, points, center=0, cache=True):
+  '''
+  H(F) at points frequencies evenly spaced in [f_start, f_stop]
+  by the chirp-z transform (Bluestein), for every row of h
+  costs one FFT of about len(h) + points, however narrow the band is
+  '''
+  h = np.asarray(h)
+  def compute():
+    N = h.shape[-1]
+    n = np.arange(N)
+    m = np.arange(points)
+    df = (f_stop - f_start) / max(points - 1, 1)
+
+    # H[m] = sum_n h[n] e^(-j2pi f_start n) e^(-j2pi df nm)
+    # nm = (n^2 + m^2 - (m-n)^2) / 2 turns the sum into a convolution
+    chirp = lambda k: np.exp(complex(0, -1) * np.pi * df * k * k)
+    L = 1
+    while L < N + points - 1:
+      L *= 2
+    a = h * np.exp(complex(0, -2) * np.pi * f_start * n) * chirp(n)
+    b = np.zeros(L, dtype=complex)
+    k = np.arange(-(N - 1), points)
+    b[k % L] = 1 / chirp(k)
+    conv = np.fft.ifft(np.fft.fft(a, L) * np.fft.fft(b), L)[..., :points]
+    H = chirp(m) * conv
+
+    F = f_start + df * m
+    if center:
+      H = H * np.exp(complex(0, 2) * np.pi * F * center)
+    return H
+  if not cache:
+    return compute()
+  return cached(h, ('czt', f_start, f_stop, points, center), compute)
+
+def freq_response(h, n_fft=8192, band=None, points=1024, center=0, whole=False):
+  '''
+  frequency response of one filter (1D h) or many filters (rows of h)
+  n_fft: FFT size of the dense grid F = m / n_fft
+  band: [f_start, f_stop] to zoom into with points frequencies (chirp-z),
+        None for the dense grid
+  center: time index of n = 0, e.g. k for a filter of length 2k+1
+  whole: dense grid over [0, 1) instead of [0, 0.5]
+  return: FreqResponse
+  '''
+  h = np.asarray(h)
+  n = np.arange(h.shape[-1]) - center
+  # group delay = Re{ DTFT(n h[n]) / DTFT(h[n]) }, both in one batch
+  pair = np.stack((h, h * n))
+
+  if band is None:
+    H, D = dtft(pair, n_fft, center, whole)
+    F = np.arange(H.shape[-1]) / n_fft
+  else:
+    H, D = czt_band(pair, band[0], band[1], points, center)
+    F = np.linspace(band[0], band[1], points)
+
+  with np.errstate(divide='ignore', invalid='ignore'):
+    group_delay = np.where(np.abs(H) > 1e-12, (D / H).real, np.nan)
+  return FreqResponse(F, H, np.abs(H), np.unwrap(np.angle(H)), group_delay)
+
+if __name__ == '__main__':
+  import time
+
+  # 16 random filters of 1025 taps at once
+  h = np.random.randn(16, 1025)
+  t1 = time.perf_counter()
+  resp = freq_response(h, n_fft=20000)
+  t2 = time.perf_counter()
+  freq_response(h, n_fft=20000)
+  print(f'cached: {time.perf_counter() - t2:.4f} s')
+  F = resp.F
+  t2 = time.perf_counter()
+  H_direct = h @ np.exp(complex(0, -2) * np.pi * np.outer(np.arange(1025), F))
+  t3 = time.perf_counter()
+  print(f'FFT: {t2 - t1:.4f} s, direct: {t3 - t2:.4f} s, '
+        f'max error {np.max(np.abs(resp.H - H_direct)):.2e}')
+
+  # zoom into [0.1, 0.12] with the chirp-z transform
+  zoom = freq_response(h, band=[0.1, 0.12], points=500)
+  H_direct = h @ np.exp(complex(0, -2) * np.pi * np.outer(np.arange(1025), zoom.F))
+  print(f'chirp-z max error {np.max(np.abs(zoom.H - H_direct)):.2e}')
+
+  # symmetric filter: constant group delay of 50 samples
+  g = np.hamming(101)
+  print(f'group delay of a symmetric filter: {np.nanmean(freq_response(g).group_delay):.6f}')
+
+# ------------------------------
+# end
+# ------------------------------
@@ -0,0 +1,94 @@
+# ------------------------------------------------------------
+# Import-time benchmark
+# startup cost of every module by python -X importtime
+# ------------------------------------------------------------
+
+import os
+import sys
+import argparse
+import subprocess
+
+from dft_benchmark import save_results
+
+def project_modules(path=None):
+  '''
+  modules of the py-modules list in pyproject.toml, so that the benchmark
+  follows the installed modules (read line by line, as tomllib needs
+  Python 3.11)
+  '''
+  if path is None:
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pyproject.toml')
+  names, inside = [], False
+  with open(path) as f:
+    for line in f:
+      line = line.split('#')[0].strip()
+      if line.startswith('py-modules'):
+        inside = True
+        line = line.partition('[')[2]
+      if inside:
+        names += [name.strip().strip('"\'') for name in line.rstrip(']').split(',')
+                  if name.strip()]
+        if line.endswith(']'):
+          break
+  return names
+
+modules = project_modules()
+
+# should only be imported by the functions that need them
+heavy_modules = ['matplotlib', 'cv2', 'scipy']
+
+def import_time(module):
+  '''
+  import module in a fresh interpreter
+  return: cumulative import time (s) of the module, the time of numpy
+          alone, and the heavy dependencies it loaded
+  '''
+  proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                        capture_output=True, text=True, check=True)
+  # lines: "import time: self [us] | cumulative | imported package"
+  total, numpy_time, loaded = 0.0, 0.0, set()
+  for line in proc.stderr.splitlines():
+    if not line.startswith('import time:') or 'cumulative' in line:
+      continue
+    _, cumulative, name = line[len('import time:'):].split('|')
+    package = name.strip()
+    if package == module:
+      total = int(cumulative) / 1e6
+    elif package == 'numpy':
+      numpy_time = int(cumulative) / 1e6
+    if package.split('.')[0] in heavy_modules:
+      loaded.add(package.split('.')[0])
+  return total, numpy_time, sorted(loaded)
+
+def run_sweep(names=None, repeat=5):
+  # best of repeat imports of every module
+  if names is None:
+    names = modules
+  results = []
+  for module in names:
+    runs = [import_time(module) for _ in range(repeat)]
+    best = min(runs, key=lambda run: run[0])
+    results.append({
+      'module': module,
+      'time_best': best[0],
+      'numpy_time': best[1],
+      'heavy_imports': best[2],
+    })
+    print(f'{module:>22}: {best[0] * 1e3:9.1f} ms '
+          f'(numpy {best[1] * 1e3:7.1f} ms)  heavy imports: {best[2] or "none"}')
+  return results
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='import-time benchmark')
+  parser.add_argument('modules', nargs='*', default=None)
+  parser.add_argument('--repeat', type=int, default=5)
+  parser.add_argument('--output', default='import_benchmark.json')
+  args = parser.parse_args()
+
+  results = run_sweep(args.modules or None, args.repeat)
+  save_results(results, args.output)
+  print(f'results saved to {args.output}')
+
+# ------------------------------
+# end
+# ------------------------------
@@ -0,0 +1,95 @@
+# ------------------------------------------------------------
+# Load generator of the JPEG encode service
+# concurrent clients, repeated images to exercise coalescing
+# ------------------------------------------------------------
+
+import numpy as np
+import time
+import asyncio
+import argparse
+
+import jpeg_service
+from benchmark_suite import synthetic_image
+
+async def client(images, count, mode, decode, latencies, where, seed):
+  # one connection sending count requests in a row
+  reader, writer = await jpeg_service.connect(*where)
+  rng = np.random.default_rng(seed)
+  try:
+    for _ in range(count):
+      img = images[rng.integers(len(images))]
+      t1 = time.perf_counter()
+      data = await jpeg_service.encode(reader, writer, img, mode)
+      if decode:
+        await jpeg_service.decode(reader, writer, data, *img.shape[:2], mode)
+      latencies.append(time.perf_counter() - t1)
+  finally:
+    writer.close()
+    await writer.wait_closed()
+
+async def run_load(clients=16, requests=20, size=256, unique=8, mode=420,
+                   decode=False, where=('127.0.0.1', 8765, None)):
+  '''
+  clients: concurrent connections, each sending requests images
+  unique: distinct images; the fewer, the more requests are coalesced
+  decode: decode every encoded image too (one more request)
+  where: (host, port, Unix socket path) of the service
+  return: client latencies (seconds), wall time, service metrics
+  '''
+  images = [synthetic_image(size, seed) for seed in range(unique)]
+  latencies = []
+  t1 = time.perf_counter()
+  await asyncio.gather(*[client(images, requests, mode, decode, latencies, where, k)
+                         for k in range(clients)])
+  wall = time.perf_counter() - t1
+  reader, writer = await jpeg_service.connect(*where)
+  stats = await jpeg_service.metrics(reader, writer)
+  writer.close()
+  await writer.wait_closed()
+  return np.array(latencies), wall, stats
+
+async def main(args):
+  where = (args.host, args.port, args.unix)
+  if args.serve:
+    # service in this process, for a quick local test
+    service = jpeg_service.EncodeService(args.workers, args.queue_size)
+    server = await service.serve(*where)
+  try:
+    latencies, wall, stats = await run_load(args.clients, args.requests, args.size,
+                                            args.unique, args.mode, args.decode, where)
+  finally:
+    if args.serve:
+      server.close()
+      await server.wait_closed()
+      await service.close()
+
+  print(f'{latencies.size} requests from {args.clients} clients in {wall:.3f} s: '
+        f'{latencies.size / wall:.1f} requests / s')
+  print(f'client latency: p50 {np.percentile(latencies, 50) * 1e3:.2f} ms  '
+        f'p99 {np.percentile(latencies, 99) * 1e3:.2f} ms  '
+        f'max {latencies.max() * 1e3:.2f} ms')
+  print('service:')
+  for key, value in stats.items():
+    print(f'{key:>14}: {value}')
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='load generator of the JPEG encode service')
+  parser.add_argument('--host', default='127.0.0.1')
+  parser.add_argument('--port', type=int, default=8765)
+  parser.add_argument('--unix', default=None, help='Unix socket path instead of TCP')
+  parser.add_argument('--clients', type=int, default=16)
+  parser.add_argument('--requests', type=int, default=20, help='requests per client')
+  parser.add_argument('--size', type=int, default=256, help='side of the test images')
+  parser.add_argument('--unique', type=int, default=8, help='distinct test images')
+  parser.add_argument('--mode', type=int, default=420)
+  parser.add_argument('--decode', action='store_true', help='decode the results too')
+  parser.add_argument('--serve', action='store_true',
+                      help='start the service in this process')
+  parser.add_argument('--workers', type=int, default=None)
+  parser.add_argument('--queue-size', type=int, default=64)
+  args = parser.parse_args()
+  asyncio.run(main(args))
+
+# ------------------------------
+# end
+# ------------------------------
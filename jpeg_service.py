@@ -0,0 +1,280 @@
+# ------------------------------------------------------------
+# Local JPEG encode / decode service
+# asyncio server, bounded queue, process pool, coalescing by content hash
+# ------------------------------------------------------------
+
+import numpy as np
+import os
+import time
+import json
+import struct
+import asyncio
+import hashlib
+import argparse
+import functools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from JPEG import JPEGCodec
+
+# request: op, l, w, mode, payload length; then the payload
+#   b'E' encode: raw (l, w, 3) uint8 BGR image -> JPEGCodec bytes
+#   b'D' decode: JPEGCodec bytes -> raw (l, w, 3) uint8 BGR image
+#   b'S' statistics: no payload -> json of EncodeService.metrics()
+request_header = struct.Struct('<1sHHHI')
+# response: status (0: ok, 1: error message), payload length; then the payload
+response_header = struct.Struct('<BI')
+max_payload = 2**28
+# largest image (4096 x 4096): a codec holds several buffers of the frame
+# size, so l, w from a request are checked before a codec is built
+max_pixels = 2**24
+# codecs kept by every worker process, least recently used dropped
+max_codecs = 8
+
+# ------------------------------------------------------------
+# jobs run by the worker processes
+# ------------------------------------------------------------
+
+def check_request(op, l, w, payload):
+  # reject a bad size before it reaches a worker or builds a codec
+  if not 0 < l * w <= max_pixels:
+    raise ValueError(f'image should have 1 ... {max_pixels} pixels, got {l} x {w}')
+  if op == b'E' and len(payload) != l * w * 3:
+    raise ValueError(f'image should have {l * w * 3} bytes, got {len(payload)}')
+
+# codecs of every process, one per frame size and mode
+@functools.lru_cache(maxsize=max_codecs)
+def codec_for(l, w, mode):
+  return JPEGCodec(l, w, mode)
+
+def encode_job(l, w, mode, payload):
+  check_request(b'E', l, w, payload)
+  frame = np.frombuffer(payload, dtype=np.uint8).reshape(l, w, 3)
+  return codec_for(l, w, mode).encode(frame)
+
+def decode_job(l, w, mode, payload):
+  check_request(b'D', l, w, payload)
+  bgr = codec_for(l, w, mode).decode(payload)
+  return np.clip(bgr, 0, 255).astype(np.uint8).tobytes()
+
+jobs = {b'E': encode_job, b'D': decode_job}
+
+# ------------------------------------------------------------
+# service
+# ------------------------------------------------------------
+
+class EncodeService:
+  '''
+  workers: processes of the pool (os.cpu_count() by default)
+  queue_size: requests waiting for a worker; when the queue is full,
+              new requests wait for room, which stops reading from their
+              connections (backpressure up to the clients)
+  history: latencies kept for the percentiles
+  concurrent requests with the same operation, size and payload are
+  computed once and the result is sent to all of them
+  if a worker process dies (e.g. out of memory), its jobs fail and the
+  pool is replaced by a new one
+  '''
+  def __init__(self, workers=None, queue_size=64, history=4096):
+    self.workers = workers
+    self.queue_size = queue_size
+    self.latencies = deque(maxlen=history)
+    self.pending = {} # content key -> future of the result
+    self.connections = set()
+    self.counters = dict(requests=0, coalesced=0, completed=0, errors=0,
+                         bytes_in=0, bytes_out=0, pool_restarts=0)
+
+  async def start(self):
+    self.pool = ProcessPoolExecutor(self.workers)
+    self.queue = asyncio.Queue(self.queue_size)
+    self.started = time.perf_counter()
+    n = self.workers or os.cpu_count() or 1
+    self.dispatchers = [asyncio.ensure_future(self.dispatch()) for _ in range(n)]
+
+  async def close(self):
+    tasks = self.dispatchers + list(self.connections)
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    self.pool.shutdown()
+
+  def restart_pool(self, broken):
+    # a broken pool runs no more jobs; the first dispatcher to see it
+    # replaces it, the others find the new one already in place
+    if self.pool is broken:
+      broken.shutdown(wait=False)
+      self.pool = ProcessPoolExecutor(self.workers)
+      self.counters['pool_restarts'] += 1
+
+  async def dispatch(self):
+    # one per worker process: move queued jobs to the pool
+    loop = asyncio.get_running_loop()
+    while True:
+      op, l, w, mode, payload, future = await self.queue.get()
+      pool = self.pool
+      try:
+        result = await loop.run_in_executor(pool, jobs[op], l, w, mode, payload)
+        if not future.done():
+          future.set_result(result)
+      except asyncio.CancelledError:
+        future.cancel()
+        raise
+      except Exception as error:
+        if isinstance(error, BrokenProcessPool):
+          self.restart_pool(pool)
+        if not future.done():
+          future.set_exception(error)
+      finally:
+        self.queue.task_done()
+
+  async def submit(self, op, l, w, mode, payload):
+    # result of a job, shared with identical requests already in progress
+    t1 = time.perf_counter()
+    self.counters['requests'] += 1
+    self.counters['bytes_in'] += len(payload)
+    try:
+      check_request(op, l, w, payload)
+    except ValueError:
+      self.counters['errors'] += 1
+      raise
+    key = (op, l, w, mode, hashlib.sha1(payload).digest())
+    future = self.pending.get(key)
+    if future is not None:
+      self.counters['coalesced'] += 1
+    else:
+      future = asyncio.get_running_loop().create_future()
+      self.pending[key] = future
+      future.add_done_callback(lambda _: self.pending.pop(key, None))
+      try:
+        await self.queue.put((op, l, w, mode, payload, future))
+      except asyncio.CancelledError:
+        future.cancel()
+        raise
+    try:
+      # shielded: a client leaving does not cancel the others' result
+      result = await asyncio.shield(future)
+    except Exception:
+      self.counters['errors'] += 1
+      raise
+    self.counters['completed'] += 1
+    self.counters['bytes_out'] += len(result)
+    self.latencies.append(time.perf_counter() - t1)
+    return result
+
+  def metrics(self):
+    elapsed = time.perf_counter() - self.started
+    stats = dict(self.counters)
+    stats['queue_depth'] = self.queue.qsize()
+    stats['in_progress'] = len(self.pending)
+    stats['uptime'] = elapsed
+    stats['throughput'] = self.counters['completed'] / elapsed # requests / s
+    if self.latencies:
+      latency = np.array(self.latencies)
+      for p in (50, 90, 99):
+        stats[f'latency_p{p}'] = float(np.percentile(latency, p))
+      stats['latency_max'] = float(latency.max())
+    return stats
+
+  async def handle(self, reader, writer):
+    # requests of one connection are answered in order
+    self.connections.add(asyncio.current_task())
+    try:
+      while True:
+        try:
+          header = await reader.readexactly(request_header.size)
+        except asyncio.IncompleteReadError:
+          break
+        op, l, w, mode, length = request_header.unpack(header)
+        if length > max_payload:
+          break
+        payload = await reader.readexactly(length)
+        status = 0
+        if op == b'S':
+          result = json.dumps(self.metrics()).encode()
+        elif op in jobs:
+          try:
+            result = await self.submit(op, l, w, mode, payload)
+          except Exception as error:
+            status, result = 1, str(error).encode()
+        else:
+          status, result = 1, f'unknown operation {op!r}'.encode()
+        writer.write(response_header.pack(status, len(result)))
+        writer.write(result)
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+      pass
+    finally:
+      self.connections.discard(asyncio.current_task())
+      writer.close()
+
+  async def serve(self, host='127.0.0.1', port=8765, path=None):
+    '''
+    start the workers and listen on localhost TCP, or on the Unix
+    socket path if given
+    return: asyncio server
+    '''
+    await self.start()
+    if path is not None:
+      return await asyncio.start_unix_server(self.handle, path)
+    return await asyncio.start_server(self.handle, host, port)
+
+# ------------------------------------------------------------
+# client
+# ------------------------------------------------------------
+
+async def connect(host='127.0.0.1', port=8765, path=None):
+  if path is not None:
+    return await asyncio.open_unix_connection(path)
+  return await asyncio.open_connection(host, port)
+
+async def request(reader, writer, op, l=0, w=0, mode=420, payload=b''):
+  # send one request and wait for its response
+  writer.write(request_header.pack(op, l, w, mode, len(payload)))
+  writer.write(payload)
+  await writer.drain()
+  status, length = response_header.unpack(await reader.readexactly(response_header.size))
+  result = await reader.readexactly(length)
+  if status:
+    raise RuntimeError(result.decode())
+  return result
+
+async def encode(reader, writer, img, mode=420):
+  l, w, _ = img.shape
+  return await request(reader, writer, b'E', l, w, mode,
+                       np.ascontiguousarray(img, dtype=np.uint8).tobytes())
+
+async def decode(reader, writer, data, l, w, mode=420):
+  result = await request(reader, writer, b'D', l, w, mode, data)
+  return np.frombuffer(result, dtype=np.uint8).reshape(l, w, 3)
+
+async def metrics(reader, writer):
+  return json.loads(await request(reader, writer, b'S'))
+
+async def main(args):
+  service = EncodeService(args.workers, args.queue_size)
+  server = await service.serve(args.host, args.port, args.unix)
+  where = args.unix if args.unix else f'{args.host}:{args.port}'
+  print(f'serving on {where}')
+  try:
+    async with server:
+      await server.serve_forever()
+  finally:
+    await service.close()
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='local JPEG encode / decode service')
+  parser.add_argument('--host', default='127.0.0.1')
+  parser.add_argument('--port', type=int, default=8765)
+  parser.add_argument('--unix', default=None, help='Unix socket path instead of TCP')
+  parser.add_argument('--workers', type=int, default=None)
+  parser.add_argument('--queue-size', type=int, default=64)
+  args = parser.parse_args()
+  try:
+    asyncio.run(main(args))
+  except KeyboardInterrupt:
+    pass
+
+# ------------------------------
+# end
+# ------------------------------
@@ -4,153 +4,436 @@
 # ------------------------------------------------------------
 
 import numpy as np
-import matplotlib.pyplot as plt
+from collections import namedtuple
 
-def mini_max_filter(length, passbd, transbd, weight, analog_intv):
-  # length: length of the impulse response
-  # passbd: list of the boundaries of passband, e.g. [0, 0.2]
-  # transbd: list of the boundaries of transition band, e.g. [0.2, 0.3]
-  # weight: dictionary of passband / stopband weight, e.g. {"pass": 1, "stop": 0.5}
-  # analog_intv: analog frequency interval, e.g. 0.0001
+from freq_response import dtft, freq_response
 
-  # parameter settings
-  k = (length - 1) // 2
-  analog_freq = int(1 / analog_intv)
+# result of a mini-max design
+# taps: impulse response
+# ripple: final maximum weighted error
+# iterations: number of exchange iterations
+# history: maximum weighted error of every iteration
+# extremal_freqs: extreme point frequencies of the final iteration
+# spec: design parameters, used for plotting
+MiniMaxResult = namedtuple('MiniMaxResult',
+  ['taps', 'ripple', 'iterations', 'history', 'extremal_freqs', 'spec'])
+
+# relative difference between the maximum error and the error level at
+# the extreme points at which the exchange has converged
+ripple_tol = 1e-6
+
+def desired_response(F, passbd, transbd, weight):
+  '''
+  weight function w, desired transfer function Hd and transition band
+  mask on the frequency grid F
+  '''
   edge_freq = sum(transbd) / 2 # transition band center
   is_lowpass = (passbd[1] == transbd[0])
 
-  F = np.linspace(0, 0.5, analog_freq + 1)
-
   # set weight function and desired transfer function
   # desired H are initialized with 1 and change to 0 for F in stopband
-  w = np.zeros(analog_freq + 1)
-  Hd = np.ones(analog_freq + 1) # desired H
-
-  for i in range(analog_freq + 1):
-    if passbd[0] <= F[i] <= passbd[1]: # F in passband
-      w[i] = weight["pass"]
-    elif transbd[0] < F[i] < transbd[1]: # F in transition band
-      if is_lowpass:
-        if F[i] >= edge_freq:
-          Hd[i] = 0
-      else: # highpass
-        if F[i] <= edge_freq:
-          Hd[i] = 0
-    else: # F in stopband
-      w[i] = weight["stop"]
-      Hd[i] = 0
-
-  # randomly assign extreme points frequencies
-  extreme_points = []
-  random_points = np.random.choice(analog_freq, k + 2)
-  random_points[0] = sum(passbd) * analog_freq // 2 # set at least one point in passband
-
-  for p in random_points:
-    # check if points are in transition band
-    if transbd[0] < F[p] < transbd[1]:
-      alt_p = p
-
-      while transbd[0] < F[alt_p] < transbd[1]:
-        # replace with a new point 
-        alt_p = np.random.choice(analog_freq, 1)[0]
-
-      # point not in transition band; becomes an extreme point
-      extreme_points.append(F[alt_p])
+  in_pass = (passbd[0] <= F) & (F <= passbd[1])
+  in_trans = (transbd[0] < F) & (F < transbd[1]) & ~in_pass
+  in_stop = ~in_pass & ~in_trans
+
+  w = np.zeros(F.size)
+  w[in_pass] = weight["pass"]
+  w[in_stop] = weight["stop"]
+
+  Hd = np.ones(F.size) # desired H
+  Hd[in_stop] = 0
+  if is_lowpass:
+    Hd[in_trans & (F >= edge_freq)] = 0
+  else: # highpass
+    Hd[in_trans & (F <= edge_freq)] = 0
+  return w, Hd, in_trans
+
+def solve_taps(F_ext, w_ext, Hd_ext, k):
+  # square matrix: cos(2 pi i F) for i = 0 ... k, then (-1)^j / W(F)
+  # solving it gives s[n], the main component of the impulse response,
+  # and the weighted error at the extreme points
+  if np.any(w_ext == 0):
+    raise ValueError('extreme points should not be in the transition band')
+  sqr = np.empty((k + 2, k + 2))
+  sqr[:, :k+1] = np.cos(2 * np.pi * np.outer(F_ext, np.arange(k + 1)))
+  sqr[:, k+1] = ((-1.0) ** np.arange(k + 2)) / w_ext
+  return np.linalg.solve(sqr, Hd_ext)
+
+def find_extrema(error, abs_error, boundaries, in_trans, k):
+  '''
+  grid indices of k+2 extreme points of the error with alternating signs
+  boundaries: grid indices of the 4 frequency boundaries
+  '''
+  # local maxima / minima of the error, and the band edges
+  # the first and last points compare with 0 in place of the missing
+  # neighbour, so they must also have the sign of the extremum
+  prev_e = np.concatenate(([0], error[:-1]))
+  next_e = np.concatenate((error[1:], [0]))
+  is_local_max = (error >= prev_e) & (error > next_e) & (error > 0)
+  is_local_min = (error <= prev_e) & (error < next_e) & (error < 0)
+  ext = np.union1d(np.flatnonzero((is_local_max | is_local_min) & ~in_trans),
+                   boundaries)
+  ext = ext[error[ext] != 0]
+
+  # keep the largest extreme point of every run of the same sign,
+  # so that the signs alternate
+  run = np.cumsum(np.concatenate(([0], np.diff(np.sign(error[ext])) != 0)))
+  order = np.lexsort((-abs_error[ext], run))
+  first = np.concatenate(([True], run[order][1:] != run[order][:-1]))
+  ext = ext[order][first]
+
+  # if there are more than k+2 extreme points, remove the smallest one:
+  # one at either end, or in the middle together with the smaller of
+  # its neighbours, which keeps the signs alternating
+  while ext.size > (k + 2):
+    e = abs_error[ext]
+    if ext.size == k + 3:
+      drop = [0] if e[0] < e[-1] else [ext.size - 1]
     else:
-      extreme_points.append(F[p])
+      i = int(np.argmin(e))
+      if i == 0 or i == ext.size - 1:
+        drop = [i]
+      else:
+        drop = [i, i - 1 if e[i - 1] < e[i + 1] else i + 1]
+    ext = np.delete(ext, drop)
+
+  # if there are less than k+2, as the first loops from random extreme
+  # points can have, add the points of the largest error
+  if ext.size < (k + 2):
+    rest = np.flatnonzero(~in_trans)
+    rest = rest[~np.isin(rest, ext)]
+    add = rest[np.argsort(abs_error[rest])[::-1][:k + 2 - ext.size]]
+    ext = np.union1d(ext, add)
+  return ext
+
+def weighted_error(F, s, passbd, transbd, weight):
+  # weighted error (R(F) - Hd(F)) * W(F) at arbitrary frequencies F
+  w, Hd, _ = desired_response(F, passbd, transbd, weight)
+  R = np.cos(2 * np.pi * np.outer(F, np.arange(s.size - 1))) @ s[:-1]
+  return (R - Hd) * w
+
+def ripple_ratio(result):
+  '''
+  maximum weighted error of a MiniMaxResult over the error at its extreme
+  points: 1 for an equiripple design, larger when the exchange stopped
+  on a wrong set of extreme points
+  '''
+  spec = result.spec
+  k = (spec['length'] - 1) // 2
+  s = np.concatenate((result.taps[k:k+1], 2 * result.taps[k+1:], [0]))
+  ext_err = weighted_error(result.extremal_freqs, s, spec['passbd'],
+                           spec['transbd'], spec['weight'])
+  return result.ripple / np.min(np.abs(ext_err))
+
+def refine_extrema(lo, hi, sign, s, passbd, transbd, weight, tol):
+  '''
+  golden-section search for the maximum of sign[i] * error in every interval
+  [lo[i], hi[i]], all intervals at once, until they are shorter than tol
+  (the sign keeps a point from moving to a neighbouring extremum)
+  '''
+  g = (np.sqrt(5) - 1) / 2
+  a, b = lo.copy(), hi.copy()
+  while a.size and np.max(b - a) > tol:
+    c = b - g * (b - a)
+    d = a + g * (b - a)
+    e = np.tile(sign, 2) * \
+        weighted_error(np.concatenate((c, d)), s, passbd, transbd, weight)
+    left = e[:c.size] > e[c.size:] # maximum is in [a, d]
+    b = np.where(left, d, b)
+    a = np.where(left, a, c)
+  return (a + b) / 2
+
+def grid_extrema(freqs, F, in_trans, k):
+  '''
+  grid indices of k+2 initial extreme points near the frequencies freqs
+  points in the transition band move to the nearest band edge, and if
+  points fall together, the grid points farthest from the others are added
+  '''
+  candidates = np.flatnonzero(~in_trans)
+  idx = np.searchsorted(F[candidates], np.clip(freqs, 0, 0.5))
+  idx = np.clip(idx, 1, candidates.size - 1)
+  left, right = candidates[idx - 1], candidates[idx]
+  ext = np.unique(np.where(np.abs(F[left] - freqs) <= np.abs(F[right] - freqs),
+                           left, right))
+  while ext.size < k + 2:
+    distance = np.abs(candidates.reshape(-1, 1) - ext).min(axis=1)
+    ext = np.union1d(ext, candidates[np.argmax(distance)])
+  return ext[:k + 2]
+
+def remap_extrema(freqs, transbd, new_transbd, new_length):
+  '''
+  extreme point frequencies of a design with transition band transbd,
+  moved to a design with new_transbd and new_length taps
+  the bands below / above the transition band are stretched linearly to
+  the new band edges, and the points of every band are resampled (by
+  their order) to the number of points the new length needs, in the same
+  proportion between the bands
+  '''
+  freqs = np.sort(np.asarray(freqs, dtype=float))
+  n_new = (new_length - 1) // 2 + 2
+  low = freqs[freqs <= sum(transbd) / 2]
+  high = freqs[freqs > sum(transbd) / 2]
+  low = low * new_transbd[0] / transbd[0] if transbd[0] > 0 else low
+  high = new_transbd[1] + (high - transbd[1]) * (0.5 - new_transbd[1]) / (0.5 - transbd[1])
+
+  n_low = int(round(n_new * low.size / freqs.size))
+  n_low = min(max(n_low, 1), n_new - 1)
+  def resample(band, n):
+    if band.size == 0:
+      return band
+    return np.interp(np.linspace(0, band.size - 1, n), np.arange(band.size), band)
+  return np.concatenate((resample(low, n_low), resample(high, n_new - n_low)))
+
+def design_mini_max(length, passbd, transbd, weight, analog_intv, verbose=False,
+                    grid='dense', seed=0, init_freqs=None, max_iter=100):
+  '''
+  design a low-pass / high-pass filter by the mini-max method
+  arguments are the same as mini_max_filter
+  verbose: print the maximum error of every iteration
+  grid: 'dense' evaluates the error on the full grid of 1/analog_intv + 1
+        points in every iteration
+        'adaptive' converges on a coarse grid (16 points per tap) first,
+        then refines the extreme points locally by golden-section search
+        down to the resolution of the full grid (and finishes on the full
+        grid if the refinement goes wrong)
+  seed: seed of the random initial extreme points, so designs are
+        reproducible (None for a different start every call)
+  init_freqs: initial extreme point frequencies in place of random ones,
+              e.g. the extremal_freqs of a similar design (see remap_extrema)
+  max_iter: stop after max_iter exchange iterations even if the error
+            has not converged (None: no limit)
+  return: MiniMaxResult, nothing is plotted
+  '''
+  # parameter settings
+  k = (length - 1) // 2
+  analog_freq = int(1 / analog_intv)
+  grid_freq = analog_freq
+  if grid == 'adaptive':
+    grid_freq = min(analog_freq, 16 * (k + 1))
 
-  extreme_points.sort()
-  extreme_points = np.array(extreme_points)
+  F = np.linspace(0, 0.5, grid_freq + 1)
+  w, Hd, in_trans = desired_response(F, passbd, transbd, weight)
+
+  # grid indices of the 4 frequency boundaries 0, transbd[0], transbd[1], 0.5
+  # the band edges are the last / first grid points outside transition band,
+  # which are moved to the exact edges (the error there is computed apart
+  # from the FFT, see grid_error)
+  trans_idx = np.flatnonzero(in_trans)
+  boundaries = np.unique([0, trans_idx[0] - 1, trans_idx[-1] + 1, grid_freq])
+  F[boundaries] = [0, transbd[0], transbd[1], 0.5]
+
+  def grid_error(s):
+    # weighted error on the grid: R(F) = sum s[i] cos(2 pi i F) at
+    # F = n / (2 * grid_freq) is the real part of a DFT of s
+    # (the taps change every loop, so nothing is cached)
+    R = dtft(s[:k+1], 2 * grid_freq, cache=False).real
+    error = (R - Hd) * w
+    error[boundaries] = weighted_error(F[boundaries], s, passbd, transbd, weight)
+    return error
+
+  if init_freqs is not None:
+    ext = grid_extrema(init_freqs, F, in_trans, k)
+  else:
+    # randomly assign extreme points (grid indices) outside transition band
+    # set at least one point in passband, at its centre sum(passbd) / 2
+    # (grid point i is F = i / (2 * grid_freq))
+    first_point = int(round(sum(passbd) * grid_freq))
+    candidates = np.flatnonzero(~in_trans)
+    candidates = candidates[candidates != first_point]
+    rng = np.random.default_rng(seed)
+    random_points = rng.choice(candidates, k + 1, replace=False)
+    ext = np.sort(np.append(random_points, first_point))
 
   # main loop
-  max_err = 200
-  prev_max_err = 0
+  # the exchange has converged when the extreme points stay the same or
+  # the maximum error equals the error level at the extreme points
+  # if it comes back to earlier extreme points, it cycles and is stopped
+  # (on the coarse grid, the refinement below goes on from there)
+  converged = False
   loop_count = 0
-  while not 0 <= prev_max_err - max_err <= analog_intv:
+  history = []
+  seen = set()
+  while not converged and (max_iter is None or loop_count < max_iter):
     loop_count += 1
 
-    # square matrix
-    sqr = np.ones((k + 2) ** 2).reshape(k+2, k+2)
-    # column 1 to k
-    for i in range(1, k+1):
-      sqr[:,i] = np.cos(2 * np.pi * i * extreme_points)
-    # column k+1
-    for j in range(k + 2):
-      sqr[j, k+1] = ((-1) ** j) / w[np.where(F == extreme_points[j])]
-
-    # desired transfer function at extreme points
-    Hd_extreme = np.ones(k + 2)
-    for i in range(k + 2):
-      Hd_extreme[i] = Hd[np.where(F == extreme_points[i])]
-    Hd_extreme = Hd_extreme.reshape(k+2, 1) # reshape to vector
-
-    # calculate s[n], the main component of the impulse response
-    # solve s[n] by multiplying the inverse square matrix
-    s = np.matmul(np.linalg.inv(sqr), Hd_extreme)
-    s = s.flatten()
-
-    # calculate frequency response R(F)
-    R = np.ones(analog_freq + 1) * s[0]
-    for i in range(1, k+1):
-      R = R + (s[i] * np.cos(2 * np.pi * i * F))
+    s = solve_taps(F[ext], w[ext], Hd[ext], k)
+    solved_ext = F[ext]
 
     # calculate error
-    error = (R - Hd) * w
+    error = grid_error(s)
     abs_error = np.absolute(error)
-    prev_max_err = max_err
     max_err = np.amax(abs_error)
+    history.append(float(max_err))
 
     # find new extreme points
-    new_ext = []
-    for i in range(analog_freq + 1):
-      if i == 0: # first point
-        is_local_max = error[i] > 0 and error[i] > error[i+1]
-        is_local_min = error[i] < 0 and error[i] < error[i+1]
-      elif i == analog_freq: # last point
-        is_local_max = error[i] > error[i-1] and error[i] > 0
-        is_local_min = error[i] < error[i-1] and error[i] < 0
-      else:
-        is_local_max = error[i] > error[i-1] and error[i] > error[i+1]
-        is_local_min = error[i] < error[i-1] and error[i] < error[i+1]
-
-      if is_local_max or is_local_min:
-        new_ext.append(F[i])
-
-    # if there are more than k+2 extreme points
-    while len(new_ext) > (k + 2):
-      min_err = 200
-      min_err_freq = 1
-      # check 4 frequency boundaries
-      if 0 in new_ext and abs_error[0] < min_err:
-        min_err = abs_error[0]
-        min_err_freq = 0
-      if transbd[0] in new_ext and abs_error[np.where(F == transbd[0])] < min_err:
-        min_err = abs_error[np.where(F == transbd[0])]
-        min_err_freq = transbd[0]
-      if transbd[1] in new_ext and abs_error[np.where(F == transbd[1])] < min_err:
-        min_err = abs_error[np.where(F == transbd[1])]
-        min_err_freq = transbd[1]
-      if 0.5 in new_ext and abs_error[analog_freq] < min_err:
-        min_err = abs_error[analog_freq]
-        min_err_freq = 0.5
-      new_ext.remove(min_err_freq)
-
-    extreme_points = np.array(new_ext)
-
-    print(f"Maximum error in loop {loop_count}: {max_err}")
+    new_ext = find_extrema(error, abs_error, boundaries, in_trans, k)
+    seen.add(ext.tobytes())
+    converged = new_ext.tobytes() in seen or \
+                max_err <= abs(s[k+1]) * (1 + ripple_tol)
+    ext = new_ext
+
+    if verbose:
+      print(f"Maximum error in loop {loop_count}: {max_err}")
   # end main loop
 
-  # plot 
+  # adaptive grid: extreme points leave the coarse grid
+  # boundary points stay at the exact band edges, the others are refined
+  # within one coarse grid step on each side
+  # the error level |delta| of an exchange never decreases; if it does,
+  # the refined points went wrong and the design is finished on the dense
+  # grid from the last extreme points
+  failed = False
+  if grid_freq < analog_freq:
+    step = 0.5 / grid_freq
+    tol = 0.5 / analog_freq
+    converged = False
+    F_ext = F[ext]
+    while not converged and (max_iter is None or loop_count < max_iter):
+      w_ext, Hd_ext, _ = desired_response(F_ext, passbd, transbd, weight)
+      new_s = solve_taps(F_ext, w_ext, Hd_ext, k)
+      if abs(new_s[k+1]) < abs(s[k+1]) * (1 - ripple_tol):
+        failed = True
+        break
+      loop_count += 1
+      s = new_s
+      solved_ext = F_ext
+
+      # locate extreme points on the coarse grid
+      error = grid_error(s)
+      abs_error = np.absolute(error)
+      ext = find_extrema(error, abs_error, boundaries, in_trans, k)
+
+      # refine them, each within its band and half way to its neighbours,
+      # so that no two points fall together
+      F_ext = F[ext]
+      mid = (F_ext[1:] + F_ext[:-1]) / 2
+      lo = np.maximum(F_ext - step, np.concatenate(([0], mid)))
+      hi = np.minimum(F_ext + step, np.concatenate((mid, [0.5])))
+      lower = F_ext <= transbd[0]
+      lo = np.where(lower, lo, np.maximum(lo, transbd[1]))
+      hi = np.where(lower, np.minimum(hi, transbd[0]), hi)
+      inner = ~np.isin(ext, boundaries)
+      sign = np.sign(error[ext[inner]])
+      refined = refine_extrema(lo[inner], hi[inner], sign, s, passbd, transbd,
+                               weight, tol)
+      # the search can miss the maximum if the error is not unimodal in
+      # the interval; such points stay on the coarse grid
+      better = sign * weighted_error(refined, s, passbd, transbd, weight) >= \
+               sign * error[ext[inner]]
+      F_ext[inner] = np.where(better, refined, F_ext[inner])
+
+      max_err = max(np.amax(abs_error),
+                    np.amax(np.abs(weighted_error(F_ext, s, passbd, transbd, weight))))
+      history.append(float(max_err))
+      converged = max_err <= abs(s[k+1]) * (1 + ripple_tol)
+
+      if verbose:
+        print(f"Maximum error in loop {loop_count}: {max_err}")
+
+  # impulse response
+  impulse_res = np.concatenate((np.flip(s[1:k+1]) * 0.5, s[0:1], s[1:k+1] * 0.5))
+  spec = {'length': length, 'passbd': list(passbd), 'transbd': list(transbd),
+          'weight': dict(weight), 'analog_intv': analog_intv, 'grid': grid,
+          'seed': seed}
+  if failed and (max_iter is None or loop_count < max_iter):
+    result = design_mini_max(length, passbd, transbd, weight, analog_intv, verbose,
+                             'dense', seed, solved_ext,
+                             None if max_iter is None else max_iter - loop_count)
+    return result._replace(iterations=loop_count + result.iterations,
+                           history=history + result.history, spec=spec)
+  return MiniMaxResult(impulse_res, float(max_err), loop_count, history,
+                       solved_ext, spec)
+
+# result of a parameter sweep
+# designs: MiniMaxResult of every spec, in order
+# iterations: exchange iterations spent on every design
+# warm: whether the design kept its warm start (False: random start)
+MiniMaxSweep = namedtuple('MiniMaxSweep', ['designs', 'iterations', 'warm'])
+
+def sweep_mini_max(specs, grid='dense', seed=0, warm_start=True, max_iter=100,
+                   tol=0.01, cold_tries=3):
+  '''
+  design a sequence of related filters, e.g. over lengths or band edges
+  specs: list of dictionaries with the arguments of design_mini_max
+         (length, passbd, transbd, weight, analog_intv)
+  warm_start: start every design from the extreme points of the previous
+              one (remapped to its band edges and length) instead of
+              random points, so it converges in a few iterations
+  max_iter: iteration limit of every design
+  tol: a warm-started design whose ripple_ratio exceeds 1 + tol has kept
+       a wrong number of points in a band; it is designed again from
+       random points (its iterations are counted too)
+  cold_tries: a design from random points is checked the same way, and
+              designed again with the next seeds up to cold_tries times;
+              the one of the lowest ripple_ratio is kept
+  return: MiniMaxSweep
+  '''
+  designs, iterations, warm = [], [], []
+  prev = None
+  for spec in specs:
+    spec = dict(spec)
+    spec.setdefault('grid', grid)
+    spec.setdefault('seed', seed)
+    spec.setdefault('max_iter', max_iter)
+    count = 0
+    result = None
+    if warm_start and prev is not None:
+      init = remap_extrema(prev.extremal_freqs, prev.spec['transbd'],
+                           spec['transbd'], spec['length'])
+      result = design_mini_max(init_freqs=init, **spec)
+      count = result.iterations
+      if ripple_ratio(result) > 1 + tol:
+        result = None
+    warm.append(result is not None)
+    if result is None:
+      for attempt in range(cold_tries):
+        cold = dict(spec)
+        if spec['seed'] is not None:
+          cold['seed'] = spec['seed'] + attempt
+        design = design_mini_max(**cold)
+        count += design.iterations
+        if result is None or ripple_ratio(design) < ripple_ratio(result):
+          result = design
+        if ripple_ratio(result) <= 1 + tol:
+          break
+    designs.append(result)
+    iterations.append(count)
+    prev = result
+  return MiniMaxSweep(designs, iterations, warm)
+
+def plot_mini_max(result):
+  '''
+  plot the frequency response of a MiniMaxResult and the desired filter
+  '''
+  import matplotlib.pyplot as plt
+
+  spec = result.spec
+  analog_freq = int(1 / spec['analog_intv'])
+  k = (spec['length'] - 1) // 2
+  F = np.linspace(0, 0.5, analog_freq + 1)
+  _, Hd, _ = desired_response(F, spec['passbd'], spec['transbd'], spec['weight'])
+
+  # h symmetric around k, so H(F) centered at n = k is real
+  R = freq_response(result.taps, n_fft=2 * analog_freq, center=k).H.real
+
   plt.figure()
   plt.plot(F, Hd, label='desired')
   plt.plot(F, R, label='R')
-  #plt.plot(F, error, label='error')
   plt.legend()
   plt.show()
 
+def mini_max_filter(length, passbd, transbd, weight, analog_intv):
+  # length: length of the impulse response
+  # passbd: list of the boundaries of passband, e.g. [0, 0.2]
+  # transbd: list of the boundaries of transition band, e.g. [0.2, 0.3]
+  # weight: dictionary of passband / stopband weight, e.g. {"pass": 1, "stop": 0.5}
+  # analog_intv: analog frequency interval, e.g. 0.0001
+  result = design_mini_max(length, passbd, transbd, weight, analog_intv,
+                           verbose=True)
+  plot_mini_max(result)
+
   # return impulse response
-  impulse_res = np.concatenate((np.flip(s[1:k+1]) * 0.5, s[0:1], s[1:k+1] * 0.5))
-  return impulse_res
+  return result.taps
 
 if __name__ == "__main__":
   imp_res = mini_max_filter(
@@ -162,6 +445,29 @@ if __name__ == "__main__":
   )
   print(imp_res)
 
+  # adaptive grid against the dense grid
+  import time
+  spec = dict(length=201, passbd=[0, 0.2], transbd=[0.2, 0.21],
+              weight={"pass": 1, "stop": 1}, analog_intv=1e-5)
+  for grid in ['dense', 'adaptive']:
+    t1 = time.perf_counter()
+    result = design_mini_max(grid=grid, **spec)
+    t2 = time.perf_counter()
+    print(f'{grid} grid: {t2 - t1:.3f} s, ripple {result.ripple:.6g}, '
+          f'{result.iterations} iterations')
+
+  # sweep of lengths and transition bands, cold and warm started
+  specs = [dict(length=length, passbd=[0, 0.2], transbd=[0.2, 0.2 + width],
+                weight={"pass": 1, "stop": 1}, analog_intv=1e-4)
+           for length in range(31, 72, 4) for width in [0.05, 0.04, 0.03]]
+  for warm_start in [False, True]:
+    t1 = time.perf_counter()
+    sweep = sweep_mini_max(specs, warm_start=warm_start)
+    t2 = time.perf_counter()
+    worst = max(ripple_ratio(design) for design in sweep.designs)
+    print(f'warm start {warm_start}: {t2 - t1:.3f} s, '
+          f'{sum(sweep.iterations)} iterations, worst ripple ratio {worst:.4f}')
+
 # ------------------------------
 # end
 # ------------------------------
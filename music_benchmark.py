@@ -0,0 +1,87 @@
+# ------------------------------------------------------------
+# Latency benchmark of the live music renderer
+# per-block time of MusicRenderer.render over block sizes
+# ------------------------------------------------------------
+
+import numpy as np
+import time
+import argparse
+import tracemalloc
+
+from number_music import MusicRenderer
+from dft_benchmark import save_results
+
+def random_score(minutes, bpm, seed=0):
+  # melody of random notes and three-note chords of four beats
+  rng = np.random.default_rng(seed)
+  beats = int(minutes * bpm)
+  score = list(rng.integers(0, 15, beats))
+  beat = [1] * beats
+  chord = [[1, 3, 5], [1, 4, 6], [2, 5, 7], [1, 3, 5]] * (beats // 16)
+  chord_beat = [4] * len(chord)
+  chord_beat[-1] += beats - sum(chord_beat)
+  return score, beat, chord, chord_beat
+
+def run_sweep(sizes, minutes=2, bpm=180, fs=44100, seed=0):
+  '''
+  render the whole score in blocks of every size
+  return: list of result dictionaries, times in seconds
+  '''
+  score, beat, chord, chord_beat = random_score(minutes, bpm, seed)
+  renderer = MusicRenderer(score, beat, bpm=bpm, chord=chord,
+                           chord_beat=chord_beat, fs=fs, max_frames=max(sizes))
+
+  results = []
+  for n in sizes:
+    renderer.reset()
+    renderer.render(n) # warm-up
+    renderer.reset()
+    times = []
+    while not renderer.finished:
+      t1 = time.perf_counter()
+      renderer.render(n)
+      t2 = time.perf_counter()
+      times.append(t2 - t1)
+    times = np.array(times)
+
+    # memory allocated by the calls, measured separately
+    renderer.reset()
+    tracemalloc.start()
+    while not renderer.finished:
+      renderer.render(n)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    budget = n / fs # time until the device needs the next block
+    results.append({
+      'frames': n,
+      'blocks': int(times.size),
+      'time_worst': float(np.max(times)),
+      'time_p99': float(np.percentile(times, 99)),
+      'time_median': float(np.median(times)),
+      'budget': budget,
+      'missed': int(np.sum(times > budget)), # blocks later than the budget
+      'peak_memory': peak,
+    })
+    print(f'{n:5d} frames: worst {np.max(times) * 1e6:9.1f} us  '
+          f'p99 {np.percentile(times, 99) * 1e6:8.1f} us  '
+          f'median {np.median(times) * 1e6:8.1f} us  '
+          f'budget {budget * 1e6:9.1f} us  missed {np.sum(times > budget)}  '
+          f'{peak} bytes')
+  return results
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='live music renderer latency benchmark')
+  parser.add_argument('--sizes', type=int, nargs='+', default=[64, 128, 256, 512, 1024])
+  parser.add_argument('--minutes', type=float, default=2)
+  parser.add_argument('--fs', type=int, default=44100)
+  parser.add_argument('--output', default='music_benchmark.json')
+  args = parser.parse_args()
+
+  results = run_sweep(args.sizes, args.minutes, fs=args.fs)
+  save_results(results, args.output)
+  print(f'results saved to {args.output}')
+
+# ------------------------------
+# end
+# ------------------------------
@@ -0,0 +1,89 @@
+# ------------------------------------------------------------
+# Benchmark of exact NTT convolution and big integer product
+# ntt_convolve vs np.convolve, multiply_digits vs Python int
+# ------------------------------------------------------------
+
+import numpy as np
+import argparse
+
+from ntt_mat import ntt_convolve, multiply_digits
+from dft_benchmark import time_function, save_results
+
+def digits_to_int(d):
+  # little-endian decimal digits -> Python int
+  # split in halves, since int(str) is quadratic for long strings
+  if d.size <= 1000:
+    return int(''.join(map(str, d[::-1]))) if d.size else 0
+  h = d.size // 2
+  return digits_to_int(d[:h]) + digits_to_int(d[h:]) * 10 ** h
+
+def run_sweep(sizes, repeat=3, warmup=1, direct_max=10**5, seed=0):
+  '''
+  sizes: input lengths (number of samples / decimal digits)
+  direct_max: np.convolve (O(n^2)) is skipped for longer inputs
+  return: list of result dictionaries
+  '''
+  rng = np.random.default_rng(seed)
+
+  results = []
+  def record(name, n, f, x, check):
+    t_best, t_median, peak = time_function(f, x, repeat, warmup)
+    results.append({
+      'method': name,
+      'N': n,
+      'time_best': t_best,
+      'time_median': t_median,
+      'throughput': n / t_best,
+      'peak_memory': peak,
+      'exact': bool(check),
+    })
+    print(f'{name:>16} n={n:<9}: {t_best * 1e3:12.3f} ms  '
+          f'{peak / 2**20:9.2f} MiB  exact: {bool(check)}')
+
+  for n in sizes:
+    # convolution of 16-bit signed samples
+    a = rng.integers(-2**15, 2**15, n)
+    b = rng.integers(-2**15, 2**15, n)
+    c = ntt_convolve(a, b)
+    if n <= direct_max:
+      ref = np.convolve(a, b)
+      record('np_convolve', n, lambda _: np.convolve(a, b), None, True)
+      check = np.array_equal(c, ref)
+    else:
+      # spot check a few outputs
+      idx = rng.integers(0, 2 * n - 1, 8)
+      lo, hi = np.maximum(idx - n + 1, 0), np.minimum(idx, n - 1)
+      check = all(c[k] == np.dot(a[l:h+1], b[k-h:k-l+1][::-1])
+                  for k, l, h in zip(idx, lo, hi))
+    record('ntt_convolve', n, lambda _: ntt_convolve(a, b), None, check)
+
+    # product of two n-digit integers
+    d1 = rng.integers(0, 10, n)
+    d2 = rng.integers(0, 10, n)
+    d1[-1] = d2[-1] = 9 # exactly n digits
+    i1, i2 = digits_to_int(d1), digits_to_int(d2)
+    prod = multiply_digits(d1, d2)
+    check = digits_to_int(prod) == i1 * i2
+    record('python_int', n, lambda _: i1 * i2, None, True)
+    record('multiply_digits', n, lambda _: multiply_digits(d1, d2), None, check)
+
+  return results
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='NTT convolution benchmark')
+  parser.add_argument('--sizes', type=int, nargs='+',
+                      default=[10**3, 10**4, 10**5, 10**6, 10**7])
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--warmup', type=int, default=1)
+  parser.add_argument('--direct-max', type=int, default=10**5,
+                      help='skip np.convolve above this length')
+  parser.add_argument('--output', default='ntt_benchmark.json')
+  args = parser.parse_args()
+
+  results = run_sweep(args.sizes, args.repeat, args.warmup, args.direct_max)
+  save_results(results, args.output)
+  print(f'results saved to {args.output}')
+
+# ------------------------------
+# end
+# ------------------------------
@@ -5,22 +5,55 @@
 import numpy as np
 
 # function for finding inverse (mod N)
+# returns 0 if x has no inverse
 def get_inv(x, N):
-  for n in range(1, N):
-    if (x * n) % N == 1:
-      return n
-  return 0
+  try:
+    return pow(x, -1, N)
+  except ValueError:
+    return 0
 
-def NTTm(N, M):
+def factorize(n):
+  # prime factors of n in ascending order, e.g. 12 -> [2, 2, 3]
+  factors = []
+  p = 2
+  while p * p <= n:
+    while n % p == 0:
+      factors.append(p)
+      n //= p
+    p += 1
+  if n > 1:
+    factors.append(n)
+  return factors
+
+# generators of (Z/MZ)*, cached by M (None if M is not prime)
+generator_cache = {}
+
+def primitive_root(M, max_tries=1000):
   '''
-  N: number of points
-  M: modulus
-  return: forward and inverse transform matrices
+  smallest generator g of the multiplicative group mod a prime M
+  g is a generator iff g**((M-1)/p) != 1 for every prime p | M-1
+  returns None if none is found (e.g. M is not prime)
   '''
+  if M in generator_cache:
+    return generator_cache[M]
 
+  primes = set(factorize(M - 1))
+  g_found = None
+  for g in range(2, min(M, max_tries + 2)):
+    if pow(g, M - 1, M) != 1: # M is not prime
+      break
+    if all(pow(g, (M - 1) // p, M) != 1 for p in primes):
+      g_found = g
+      break
+
+  generator_cache[M] = g_found
+  return g_found
+
+def search_root(N, M):
   # find the smallest number a such that:
   #   a**N (mod M) = 1
   #   a**n (mod M) != 1 for n = 0, 1, 2, ... N-1
+  # exhaustive search, only used for moduli without a generator
   a = 1
   found_a = False
   while not found_a:
@@ -37,25 +70,381 @@ def NTTm(N, M):
           found_a = True
         else:
           break
+  return a
+
+def find_root(N, M):
+  '''
+  primitive N-th root of unity (mod M)
+  for a prime M with N | M-1, this is g**((M-1)/N) for a generator g
+  '''
+  if (M - 1) % N == 0:
+    g = primitive_root(M)
+    if g is not None:
+      return pow(g, (M - 1) // N, M)
+  return search_root(N, M)
+
+# (root, inverse root, inverse of N) cached by (N, M)
+ntt_param_cache = {}
+
+def ntt_params(N, M):
+  key = (N, M)
+  if key not in ntt_param_cache:
+    a = find_root(N, M)
+    if a is None:
+      return
+    ntt_param_cache[key] = (a, get_inv(a, M), get_inv(N, M))
+  return ntt_param_cache[key]
+
+def NTTm(N, M):
+  '''
+  N: number of points
+  M: modulus
+  return: forward and inverse transform matrices
+  '''
 
-  # find inverse of a, N ---------------------------
-  a_inv = get_inv(a, M)
-  N_inv = get_inv(N, M)
+  # root a and inverse of a, N ---------------------
+  params = ntt_params(N, M)
+  if params is None:
+    return
+  a, a_inv, N_inv = params
 
   # construct NTT matrix ---------------------------
-  ntt_mat = np.ones((N, N))
-  ntt_mat_inv = np.ones((N, N))
+  # entry (i, j) is a^(ij mod N), from the powers of a in exact int64
+  # arithmetic (float products lose precision for large M); the matrices
+  # stay float64, which holds every residue below 2**53 exactly
+  exponent = np.outer(np.arange(N), np.arange(N)) % N
+  ntt_mat = power_table(a, N, M)[exponent]
+  ntt_mat_inv = power_table(a_inv, N, M)[exponent]
+  ntt_mat_inv = mulmod(ntt_mat_inv, N_inv, M)
 
-  for i in range(1, N): # first row
-    ntt_mat[1, i] = (ntt_mat[1, i-1] * a) % M
-    ntt_mat_inv[1, i] = (ntt_mat_inv[1, i-1] * a_inv) % M
-  for j in range(2, N): # other part
-    ntt_mat[j, 1:N] = (ntt_mat[j-1, 1:N] * ntt_mat[1, 1:N]) % M
-    ntt_mat_inv[j, 1:N] = (ntt_mat_inv[j-1, 1:N] * ntt_mat_inv[1, 1:N]) % M
+  return ntt_mat.astype(float), ntt_mat_inv.astype(float)
 
-  ntt_mat_inv = (ntt_mat_inv * N_inv) % M
+# ------------------------------------------------------------
+# fast NTT
+# ------------------------------------------------------------
+
+# largest modulus for exact int64 arithmetic: (M-1)**2 + M < 2**63
+max_modulus = 2 ** 31
+
+# transform plans are cached by (N, M, root)
+ntt_plan_cache = {}
+
+def power_table(w, n, M):
+  # w**j (mod M) for j = 0, 1, ... n-1, built by doubling
+  table = np.ones(1, dtype=np.int64)
+  while table.size < n:
+    step = pow(int(w), table.size, M)
+    table = np.concatenate((table, table * step % M))
+  return table[:n]
+
+def reduce_once(x, M):
+  # x in [0, 2M) -> x (mod M) in place, cheaper than np.remainder
+  # x - M wraps around to a huge unsigned number when x < M
+  u = x.view(np.uint64)
+  np.minimum(u, u - np.uint64(M), out=u)
+  return x
+
+def get_ntt_plan(N, M, root):
+  '''
+  mixed-radix decimation-in-frequency plan for an N-point transform
+  every stage splits the current length n into r x m (r: radix):
+    X[k1 + r*k2] = sum_n2 w^(r*n2*k2) w^(n2*k1) sum_n1 x[n1*m + n2] w^(m*n1*k1)
+  so the stages work on contiguous blocks and leave the output in
+  digit-reversed order, which is undone by one final reordering
+  return: (list of (r, m, twiddle w^(n2*k1), radix-r matrix), order)
+  '''
+  key = (N, M, root)
+  if key in ntt_plan_cache:
+    return ntt_plan_cache[key]
+
+  stages = []
+  radices = factorize(N)
+  n = N
+  w = root
+  for r in radices:
+    m = n // r
+    powers = power_table(w, n, M)
+    k1 = np.arange(r).reshape(r, 1)
+    twiddle = powers[(k1 * np.arange(m)) % n]
+    radix_mat = powers[(m * k1 * np.arange(r)) % n]
+    stages.append((r, m, twiddle, radix_mat))
+    n = m
+    w = pow(w, r, M)
+
+  # frequency of every output position, built from the last stage:
+  #   position k1*m + p  ->  frequency k1 + r * freq_m[p]
+  freq = np.zeros(1, dtype=np.int64)
+  for r in reversed(radices):
+    freq = (np.arange(r).reshape(r, 1) + r * freq).flatten()
+  order = np.argsort(freq)
 
-  return ntt_mat, ntt_mat_inv
+  ntt_plan_cache[key] = (stages, order)
+  return stages, order
+
+def run_ntt_plan(plan, x, M):
+  # x: int64 array of residues, transformed in place along the last axis
+  stages, order = plan
+  batch = x.shape[:-1]
+  N = x.shape[-1]
+  temp = np.empty(batch + (N // 2,), dtype=np.int64)
+
+  blocks = 1
+  for r, m, twiddle, radix_mat in stages:
+    v = x.reshape(batch + (blocks, r, m))
+
+    if r == 2: # butterfly
+      a, b = v[..., 0, :], v[..., 1, :]
+      t = temp.reshape(batch + (blocks, m))
+      np.subtract(a, b, out=t)
+      t += M
+      a += b
+      reduce_once(a, M)
+      t *= twiddle[1]
+      np.remainder(t, M, out=b)
+    else:
+      y = np.empty(v.shape, dtype=np.int64)
+      for k1 in range(r):
+        acc = y[..., k1, :]
+        acc[...] = v[..., 0, :]
+        for n1 in range(1, r):
+          acc += v[..., n1, :] * radix_mat[n1, k1] % M
+          reduce_once(acc, M)
+        acc *= twiddle[k1]
+        acc %= M
+      v[...] = y
+    blocks *= r
+
+  return x[..., order]
+
+def ntt(x, M, inverse=False, root=None):
+  '''
+  fast number theoretic transform of x along the last axis
+  uses the same root as NTTm, computed in exact int64 arithmetic
+  x: integer array, any batch shape
+  M: modulus, smaller than 2**31
+  inverse: perform the inverse transform
+  root: primitive N-th root of unity (mod M), same as NTTm if None
+  every stage passes over the whole array with an int64 remainder, so a
+  2**20-point transform takes about 0.1 - 0.3 s, not milliseconds
+  '''
+  if M >= max_modulus:
+    raise ValueError(f'modulus should be smaller than {max_modulus}')
+  x = np.asarray(x, dtype=np.int64) % M
+  N = x.shape[-1]
+  if root is None:
+    params = ntt_params(N, M)
+    if params is None:
+      raise ValueError(f'no primitive {N}-th root of unity (mod {M})')
+    root, root_inv, N_inv = params
+  else:
+    root_inv = pow(root, N - 1, M) # root**N = 1
+    N_inv = get_inv(N, M)
+
+  if not inverse:
+    return run_ntt_plan(get_ntt_plan(N, M, root), x, M)
+
+  X = run_ntt_plan(get_ntt_plan(N, M, root_inv), x, M)
+  return X * N_inv % M
+
+# ------------------------------------------------------------
+# modular linear algebra
+# ------------------------------------------------------------
+
+def barrett_reduce(x, M):
+  '''
+  x (mod M) for an int64 array x in [0, 2**63), M < 2**31
+  Barrett reduction with a floating-point reciprocal: the quotient
+  x * (1/M) is off by at most about 2**10 / M + 2 when x is rounded to
+  float64, so a second round on the small remainder (exact in float64)
+  leaves r in [-M, 2M), which two reduce_once calls bring into [0, M)
+  '''
+  M_inv = 1.0 / M
+  r = x - (x * M_inv).astype(np.int64) * M
+  r -= np.floor(r * M_inv).astype(np.int64) * M
+  r += M
+  return reduce_once(reduce_once(r, M), M)
+
+def mulmod(a, b, M):
+  # a * b (mod M) for residues a, b, M < 2**31 (the product fits int64)
+  return barrett_reduce(np.multiply(a, b, dtype=np.int64), M)
+
+def split_limbs(x):
+  # residues -> (high, low) 16-bit limbs as float64, x = high * 2**16 + low
+  x = np.asarray(x).astype(np.int64)
+  return (x >> 16).astype(float), (x & 0xFFFF).astype(float)
+
+def mod_matmul(A, B, M, block=2**20):
+  '''
+  exact (A @ B) mod M for residue matrices (integer or float dtype,
+  entries in [0, M)), M < 2**31, batched as np.matmul
+  both operands are split into 16-bit limbs, A = Ah 2**16 + Al, so every
+  limb product is below 2**32 and a float64 (BLAS) product of the limbs
+  summed over block <= 2**20 terms stays below 2**52, i.e. exact;
+  the inner dimension is processed block by block and every partial
+  product is reduced before it is combined:
+    A @ B = (Ah @ Bh) 2**32 + (Ah @ Bl + Al @ Bh) 2**16 + Al @ Bl
+  return: int64 array
+  '''
+  if M >= max_modulus:
+    raise ValueError(f'modulus should be smaller than {max_modulus}')
+  if block > 2**20:
+    raise ValueError('block should not be larger than 2**20')
+  A_hi, A_lo = split_limbs(A)
+  B_hi, B_lo = split_limbs(B)
+  K = A_hi.shape[-1]
+  B_rows = (lambda X, k0, k1: X[k0:k1]) if B_hi.ndim == 1 else \
+           (lambda X, k0, k1: X[..., k0:k1, :])
+  shift_16 = pow(2, 16, M)
+  shift_32 = pow(2, 32, M)
+
+  C = None
+  for k0 in range(0, max(K, 1), block):
+    k1 = min(k0 + block, K)
+    a_hi, a_lo = A_hi[..., k0:k1], A_lo[..., k0:k1]
+    b_hi, b_lo = B_rows(B_hi, k0, k1), B_rows(B_lo, k0, k1)
+    hh = barrett_reduce((a_hi @ b_hi).astype(np.int64), M)
+    mid = barrett_reduce((a_hi @ b_lo + a_lo @ b_hi).astype(np.int64), M)
+    ll = barrett_reduce((a_lo @ b_lo).astype(np.int64), M)
+    part = barrett_reduce(hh * shift_32 + ll, M)
+    part = barrett_reduce(mid * shift_16 + part, M)
+    C = part if C is None else reduce_once(C + part, M)
+  return C
+
+def mod_matvec(A, x, M, block=2**20):
+  '''
+  exact A x (mod M) for every vector of x along the last axis,
+  e.g. an NTTm matrix applied to a batch of signals (rows of x)
+  return: int64 array of the shape of x (with A.shape[0] points)
+  '''
+  return mod_matmul(x, np.asarray(A).T, M, block)
+
+# ------------------------------------------------------------
+# exact convolution by NTT with several primes
+# ------------------------------------------------------------
+
+# NTT-friendly primes below 2**31, M = c * 2**k + 1
+ntt_primes = [2013265921, 469762049, 167772161, 998244353, 754974721]
+
+def crt_combine(residues, primes):
+  '''
+  Chinese remainder theorem by Garner's algorithm
+  residues: list of int64 arrays, residues[i] = x (mod primes[i])
+  return: x in [0, prod(primes)), int64 if it fits, else object array
+  '''
+  # mixed-radix digits: x = d0 + p0 * (d1 + p1 * (d2 + ...))
+  digits = []
+  for i, (r, p) in enumerate(zip(residues, primes)):
+    # subtract the known part and divide by p0 * ... * p(i-1), mod p
+    d = r % p
+    prefix = 1
+    for j in range(i):
+      d = (d - digits[j] * (prefix % p)) % p
+      prefix *= primes[j]
+    d = d * get_inv(prefix % p, p) % p
+    digits.append(d)
+
+  P = 1
+  for p in primes:
+    P *= p
+  dtype = np.int64 if P < 2 ** 63 else object
+
+  x = digits[-1].astype(dtype)
+  for d, p in zip(reversed(digits[:-1]), reversed(primes[:-1])):
+    x = x * p + d
+  return x
+
+def ntt_convolve(a, b, primes=None):
+  '''
+  exact linear convolution of integer sequences a, b (along the last axis)
+  a, b are transformed with NTT for enough primes to hold every output,
+  then combined by the Chinese remainder theorem
+  primes: moduli to use, chosen by the size of the result if None
+  return: int64 array if the result fits, else object array of Python int
+  '''
+  a = np.asarray(a, dtype=np.int64)
+  b = np.asarray(b, dtype=np.int64)
+  la, lb = a.shape[-1], b.shape[-1]
+  n = la + lb - 1
+  L = 1
+  while L < n:
+    L *= 2
+
+  # largest possible output magnitude
+  a_max = int(np.abs(a).max(initial=0))
+  b_max = int(np.abs(b).max(initial=0))
+  bound = min(la, lb) * a_max * b_max
+  signed = bool((a < 0).any() or (b < 0).any())
+
+  if primes is None:
+    # at least one prime, even if every output is 0
+    primes = []
+    P = 1
+    for p in ntt_primes:
+      if primes and P > (2 * bound if signed else bound):
+        break
+      if (p - 1) % L == 0:
+        primes.append(p)
+        P *= p
+    if P <= (2 * bound if signed else bound):
+      raise ValueError(f'not enough NTT primes for length {L}')
+
+  # zero-padded transforms, pointwise product and inverse for every prime
+  pad_a = np.zeros(a.shape[:-1] + (L,), dtype=np.int64)
+  pad_b = np.zeros(b.shape[:-1] + (L,), dtype=np.int64)
+  pad_a[..., :la] = a
+  pad_b[..., :lb] = b
+  residues = []
+  for p in primes:
+    C = ntt(pad_a, p) * ntt(pad_b, p) % p
+    residues.append(ntt(C, p, inverse=True)[..., :n])
+
+  c = crt_combine(residues, primes)
+  if signed: # values above P/2 are negative
+    P = 1
+    for p in primes:
+      P *= p
+    c = np.where(c > P // 2, c - P, c)
+
+  if c.dtype == object and bound < 2 ** 63:
+    c = c.astype(np.int64)
+  return c
+
+def multiply_digits(a, b, base=10):
+  '''
+  product of two big integers given as digit arrays
+  a, b: digits in base `base`, least significant digit first
+  return: digits of a * b (int64 array, least significant digit first)
+  '''
+  c = ntt_convolve(a, b)
+  if c.dtype == object:
+    raise ValueError('digit products are too large, use a smaller base')
+
+  # make room for the carries above the top digit
+  top = 1
+  c_max = int(c.max(initial=0))
+  while c_max >= base ** top:
+    top += 1
+  c = np.concatenate((c, np.zeros(top + 1, dtype=np.int64)))
+
+  # carry passes until every value is at most base
+  while c.max() > base:
+    carry = c // base
+    c -= carry * base
+    c[1:] += carry[:-1]
+
+  # remaining carries are 0 or 1 and ripple through runs of base-1
+  # carry into position i comes from the last position j < i that does
+  # not just pass a carry along (c[j] != base-1), if c[j] == base
+  generate = c >= base
+  stop = generate | (c != base - 1)
+  last = np.maximum.accumulate(np.where(stop, np.arange(c.size), -1))
+  carry_in = np.zeros(c.size, dtype=np.int64)
+  carry_in[1:] = (last[:-1] >= 0) & generate[np.maximum(last[:-1], 0)]
+  c = (c + carry_in) % base
+
+  # strip leading zeros, keep at least one digit
+  nonzero = np.flatnonzero(c)
+  return c[:nonzero[-1] + 1] if nonzero.size else c[:1]
 
 # ------------------------------------------------------------
 # test
@@ -70,6 +459,29 @@ if __name__ == '__main__':
   C = np.matmul(A, B) % M
   print(C) # should be an unit matrix
 
+  # exact for moduli near 2**31, where float products lose precision
+  M_big = 2013265921
+  A_big, B_big = NTTm(64, M_big)
+  print(np.array_equal(mod_matmul(A_big, B_big, M_big), np.eye(64, dtype=np.int64)))
+  x_big = np.random.randint(0, M_big, (1000, 64))
+  print(np.array_equal(mod_matvec(A_big, x_big, M_big), ntt(x_big, M_big)))
+
+  # fast NTT should match the matrix product
+  x = np.random.randint(0, M, (4, N))
+  X = ntt(x, M)
+  print(np.array_equal(X, (x @ A.T.astype(np.int64)) % M))
+  print(np.array_equal(ntt(X, M, inverse=True), x))
+
+  # exact convolution and big integer product
+  u = np.random.randint(-10**6, 10**6, 1000)
+  v = np.random.randint(-10**6, 10**6, 1000)
+  print(np.array_equal(ntt_convolve(u, v), np.convolve(u, v)))
+  d1 = np.random.randint(0, 10, 500)
+  d2 = np.random.randint(0, 10, 500)
+  prod = multiply_digits(d1, d2)
+  to_int = lambda d: int(''.join(map(str, d[::-1])))
+  print(to_int(prod) == to_int(d1) * to_int(d2))
+
 # ------------------------------------------------------------
 # end
 # ------------------------------------------------------------
@@ -4,11 +4,355 @@
 # ------------------------------------------------------------
 
 import numpy as np
-import matplotlib.pyplot as plt
-import scipy.io.wavfile as scipy_wav
+import struct
+from collections import OrderedDict
+
+# used for note to frequency conversion
+note_convert = {
+  1: 0, 1.5: 1,
+  2: 2, 2.5: 3,
+  3: 4,
+  4: 5, 4.5: 6,
+  5: 7, 5.5: 8,
+  6: 9, 6.5: 10,
+  0: 11
+}
+
+def note_frequency(note, f_base, octave=0):
+  # frequency of a (positive) note number, octave shifts by octaves
+  e = (note_convert[note % 7] / 12) + (note // 7)
+  if note // 7 == 0: # fix exponent if the note is B
+    e = e - 1
+  return f_base * (2 ** (e + octave))
+
+def check_chords(beat, chord, chord_beat):
+  # whether chord parameters are valid, prints the reason if not
+  if len(chord) != len(chord_beat):
+    print('Error: chord and chord_beat have different length,')
+    print('so chord are not generated.')
+    return False
+  if sum(chord_beat) != sum(beat):
+    print('Error: beat and chord_beat have different sum,')
+    print('so chord are not generated.')
+    return False
+  return True
+
+def note_events(score, beat, chord, chord_beat, ppb, f_base):
+  '''
+  schedule of the notes to synthesize
+  return: list of (start, length, frequencies, initial amplitude) in
+          samples, melody notes first, then chords (frequency of chord
+          notes are lower 8); silent notes are left out
+          and the total number of samples
+  '''
+  events = []
+  start = 0
+  for i in range(len(score)):
+    length = int(beat[i] * ppb)
+    if score[i] != 0: # not a silent note
+      events.append((start, length, [note_frequency(score[i], f_base)], 1))
+    start += length
+  total = start
+
+  start = 0
+  for i in range(len(chord)):
+    length = int(chord_beat[i] * ppb)
+    if len(chord[i]) != 0:
+      freqs = [note_frequency(note, f_base, -1) for note in chord[i]]
+      # smaller initial amplitude than melody
+      events.append((start, length, freqs, 0.2))
+    start += length
+  return events, total
+
+def synthesize(freqs, length, A_init, tc, fs, offset=0):
+  '''
+  sum of cosines A_init exp(-t/tc) cos(2 pi f t) at frequencies freqs,
+  samples offset ... offset+length-1 of the note
+  the amplitude decays exponentially with time constant tc,
+  the decay make the sound more realistic
+  with z = -1/(tc fs) + j 2 pi f/fs, sample n = m*B + r of a voice is
+  Re(exp(z m B) exp(z r)), so all voices of the (blocks x B) signal are
+  one (blocks x voices) by (voices x B) matrix product, needing about
+  2 sqrt(length) exponentials per voice instead of length cosines
+  '''
+  B = max(int(np.sqrt(length)), 1) # block size
+  M = -(-length // B)              # number of blocks
+  z = -1 / (tc * fs) + complex(0, 2) * np.pi * np.asarray(freqs, dtype=float) / fs
+  P = np.exp(np.multiply.outer(np.arange(M) * B + offset, z)) # blocks x voices
+  Q = A_init * np.exp(np.multiply.outer(z, np.arange(B)))     # voices x B
+  return (P.real @ Q.real - P.imag @ Q.imag).reshape(-1)[:length]
+
+class WaveformCache:
+  '''
+  LRU cache of synthesized notes and chords, keyed on
+  (frequencies, sample count, tc, fs, amplitude)
+  max_bytes: total size of the kept waveforms, least recently used dropped
+  notes larger than max_bytes // 4 are not cached (see cacheable), so one
+  long note cannot evict all others
+  hits / misses count the lookups, stats() summarizes them
+  '''
+  def __init__(self, max_bytes=64 * 2**20):
+    self.max_bytes = max_bytes
+    self.max_entry_bytes = max_bytes // 4
+    self.waveforms = OrderedDict()
+    self.bytes = 0
+    self.hits = 0
+    self.misses = 0
+
+  def cacheable(self, length):
+    # whether the waveform of a note of length samples is kept
+    return length * np.dtype(float).itemsize <= self.max_entry_bytes
+
+  def get(self, freqs, length, A_init, tc, fs):
+    # waveform of the whole note (read-only)
+    key = (tuple(freqs), length, tc, fs, A_init)
+    if key in self.waveforms:
+      self.hits += 1
+      self.waveforms.move_to_end(key)
+      return self.waveforms[key]
+    self.misses += 1
+    waveform = synthesize(freqs, length, A_init, tc, fs)
+    waveform.flags.writeable = False
+    if self.cacheable(length):
+      self.waveforms[key] = waveform
+      self.bytes += waveform.nbytes
+      while self.bytes > self.max_bytes:
+        _, dropped = self.waveforms.popitem(last=False)
+        self.bytes -= dropped.nbytes
+    return waveform
+
+  def clear(self):
+    self.waveforms.clear()
+    self.bytes = 0
+    self.hits = 0
+    self.misses = 0
+
+  def stats(self):
+    lookups = self.hits + self.misses
+    return {'hits': self.hits, 'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.waveforms), 'bytes': self.bytes}
+
+# shared by all renders
+waveform_cache = WaveformCache()
+
+def note_signal(freqs, length, A_init, tc, fs, offset, count, cache):
+  # samples offset ... offset+count-1 of a note of length samples
+  # notes too large for the cache are synthesized for the slice only,
+  # not in full for every block they overlap
+  if cache is None or not cache.cacheable(length):
+    return synthesize(freqs, count, A_init, tc, fs, offset)
+  return cache.get(freqs, length, A_init, tc, fs)[offset:offset+count]
+
+def render_music(events, total, tc, fs, cache=waveform_cache):
+  '''
+  mix the scheduled notes into one preallocated signal
+  cache: WaveformCache for repeated notes, None to synthesize every note
+  '''
+  music_signal = np.zeros(total)
+  for start, length, freqs, A_init in events:
+    count = min(length, total - start) # chords longer than the melody
+    if count > 0:
+      music_signal[start:start+count] += note_signal(freqs, length, A_init,
+                                                     tc, fs, 0, count, cache)
+  return music_signal
+
+def render_blocks(events, total, tc, fs, block_size=65536, cache=waveform_cache):
+  '''
+  generator of the signal of render_music in blocks of block_size samples
+  (the last one shorter), so memory does not grow with the song length
+  (apart from the bounded cache)
+  '''
+  events = sorted(events, key=lambda event: event[0])
+  next_event = 0
+  active = []
+  block = np.zeros(block_size)
+  for b0 in range(0, total, block_size):
+    b1 = min(b0 + block_size, total)
+    while next_event < len(events) and events[next_event][0] < b1:
+      active.append(events[next_event])
+      next_event += 1
+    active = [event for event in active if event[0] + event[1] > b0]
+
+    block[:] = 0
+    for start, length, freqs, A_init in active:
+      lo, hi = max(start, b0), min(start + length, b1)
+      block[lo-b0:hi-b0] += note_signal(freqs, length, A_init, tc, fs,
+                                        lo - start, hi - lo, cache)
+    yield block[:b1-b0]
+
+def peak_bound(events):
+  '''
+  upper bound of |signal|: the largest sum of initial amplitudes of the
+  voices sounding at the same time
+  '''
+  if not events:
+    return 0.0
+  starts = np.array([event[0] for event in events])
+  ends = starts + np.array([event[1] for event in events])
+  amps = np.array([event[3] * len(event[2]) for event in events], dtype=float)
+  times = np.concatenate((starts, ends))
+  change = np.concatenate((amps, -amps))
+  order = np.lexsort((change, times)) # notes ending first on ties
+  return float(np.max(np.cumsum(change[order])))
+
+class WavWriter:
+  '''
+  mono .wav file written block by block
+  sample_format: 'int16' (PCM) or 'float32' (IEEE float)
+  samples are clipped to [-1, 1] before conversion
+  the header is completed on close(), when the length is known
+  '''
+  def __init__(self, path, fs, sample_format='int16'):
+    if sample_format not in ('int16', 'float32'):
+      raise ValueError("sample_format should be 'int16' or 'float32'")
+    self.fs = int(fs)
+    self.sample_format = sample_format
+    self.frames = 0
+    self.file = open(path, 'wb')
+    self.write_header()
+
+  def write_header(self):
+    data_size = self.frames * 2 if self.sample_format == 'int16' else self.frames * 4
+    if self.sample_format == 'int16':
+      fmt = struct.pack('<HHIIHH', 1, 1, self.fs, self.fs * 2, 2, 16)
+      fact = b''
+    else: # non-PCM formats need cbSize and a fact chunk
+      fmt = struct.pack('<HHIIHHH', 3, 1, self.fs, self.fs * 4, 4, 32, 0)
+      fact = b'fact' + struct.pack('<II', 4, self.frames)
+    riff_size = 4 + 8 + len(fmt) + len(fact) + 8 + data_size
+    self.file.seek(0)
+    self.file.write(b'RIFF' + struct.pack('<I', riff_size) + b'WAVE')
+    self.file.write(b'fmt ' + struct.pack('<I', len(fmt)) + fmt + fact)
+    self.file.write(b'data' + struct.pack('<I', data_size))
+
+  def write(self, block):
+    block = np.clip(block, -1, 1)
+    if self.sample_format == 'int16':
+      block = np.round(block * 32767).astype('<i2')
+    else:
+      block = block.astype('<f4')
+    self.file.write(block.tobytes())
+    self.frames += block.size
+
+  def close(self):
+    self.write_header()
+    self.file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+def write_music(path, events, total, tc, fs, sample_format='int16',
+                block_size=65536, gain=None, cache=waveform_cache):
+  '''
+  render the scheduled notes block by block straight into a .wav file
+  gain: scale of the samples, by default 1 / peak_bound(events) so that
+        nothing is clipped
+  '''
+  if gain is None:
+    bound = peak_bound(events)
+    gain = 1 / bound if bound > 0 else 1
+  with WavWriter(path, fs, sample_format) as wav:
+    for block in render_blocks(events, total, tc, fs, block_size, cache):
+      wav.write(block * gain)
+
+class MusicRenderer:
+  '''
+  block renderer for live playback, e.g. from an audio device callback
+  the score is turned into a schedule of voices up front, render(n_frames)
+  returns the next n_frames samples (n_frames <= max_frames)
+  every voice is a decaying complex oscillator: a block is its state times
+  a table exp(z r), r = 0 ... max_frames, computed once per frequency, so a
+  call does a few in-place operations per sounding voice and allocates
+  no sample buffers
+  gain: scale of the samples, 1 / peak_bound() of the score by default
+  '''
+  def __init__(self, score, beat, bpm=180, f_base=524, chord=[], chord_beat=[],
+               tc=0.5, fs=22050, max_frames=1024, gain=None):
+    if len(score) != len(beat):
+      raise ValueError('score and beat should have the same length')
+    if len(chord) != 0 and not check_chords(beat, chord, chord_beat):
+      chord, chord_beat = [], []
+    ppb = int(60 / bpm * fs) # points per beat
+    events, self.total = note_events(score, beat, chord, chord_beat, ppb, f_base)
+    if gain is None:
+      bound = peak_bound(events)
+      gain = 1 / bound if bound > 0 else 1
+    self.fs = fs
+    self.max_frames = max_frames
+
+    # one voice per note of every event: (start, end, frequency, amplitude)
+    self.tables = {}
+    r = np.arange(max_frames + 1)
+    self.voices = []
+    for start, length, freqs, A_init in events:
+      for f in freqs:
+        if f not in self.tables:
+          step = np.exp((-1 / (tc * fs) + complex(0, 2) * np.pi * f / fs) * r)
+          self.tables[f] = (step.real.copy(), step.imag.copy(), step)
+        self.voices.append((start, min(start + length, self.total), f, A_init * gain))
+    self.voices.sort(key=lambda voice: voice[0])
+
+    self.out = np.zeros(max_frames)
+    self.temp = np.zeros(max_frames)
+    self.reset()
+
+  def reset(self):
+    # back to the beginning of the score
+    self.position = 0
+    self.next_voice = 0
+    self.active = [] # [start, end, state, table] of the sounding voices
+
+  @property
+  def finished(self):
+    return self.position >= self.total
+
+  def render(self, n_frames, out=None):
+    '''
+    next n_frames samples (silence after the end of the score)
+    out: array to write into, by default an internal buffer which is
+         overwritten by the next call
+    '''
+    if n_frames > self.max_frames:
+      raise ValueError('n_frames should not be larger than max_frames')
+    if out is None:
+      out = self.out[:n_frames]
+    out.fill(0)
+    b0, b1 = self.position, self.position + n_frames
+
+    # voices starting in this block
+    while self.next_voice < len(self.voices) and self.voices[self.next_voice][0] < b1:
+      start, end, f, A = self.voices[self.next_voice]
+      self.active.append([start, end, complex(A), self.tables[f]])
+      self.next_voice += 1
+
+    ended = False
+    for voice in self.active:
+      start, end, state, (step_re, step_im, step) = voice
+      lo, hi = max(start, b0), min(end, b1)
+      if hi > lo:
+        # Re(state exp(z r)) for the samples lo ... hi-1 of the block
+        k = hi - lo
+        temp = self.temp[:k]
+        part = out[lo-b0:hi-b0]
+        np.multiply(step_re[:k], state.real, out=temp)
+        np.add(part, temp, out=part)
+        np.multiply(step_im[:k], -state.imag, out=temp)
+        np.add(part, temp, out=part)
+        voice[2] = state * step[k]
+      ended = ended or end <= b1
+    if ended:
+      self.active = [voice for voice in self.active if voice[1] > b1]
+
+    self.position = b1
+    return out
 
 def numbers_to_music(score, beat, name='music', bpm=180, f_base=524,
-                     chord=[], chord_beat=[], tc=0.5, fs=22050):
+                     chord=[], chord_beat=[], tc=0.5, fs=22050,
+                     sample_format=None, block_size=65536):
   # function for generating music files by score and beat numbers
   # score should contain non-negative numbers only
   # options: 
@@ -17,6 +361,8 @@ def numbers_to_music(score, beat, name='music', bpm=180, f_base=524,
   #   8 degree higher than the middle C at 440Hz standard
   # - time constant, used for amplitude decay
   # - sampling frequency
+  # - sample format: None writes the whole song as float64 at once,
+  #   'int16' / 'float32' render and write it block by block (normalized)
   
   # check whether the score and beat have the same length
   if len(score) != len(beat):
@@ -25,86 +371,21 @@ def numbers_to_music(score, beat, name='music', bpm=180, f_base=524,
 
   # parameters
   ppb = int(60 / bpm * fs) # points per beat
-  note_num = len(score)    # number of notes
-  note_convert = {         # used for note to frequency conversion
-    1: 0, 1.5: 1,
-    2: 2, 2.5: 3,
-    3: 4,
-    4: 5, 4.5: 6,
-    5: 7, 5.5: 8,
-    6: 9, 6.5: 10,
-    0: 11
-  }
-
-  # generate music signal (melody)
-  music_signal = np.empty(0)
-
-  for i in range(note_num):
-    if score[i] == 0: # silent note
-      music_signal = np.append(music_signal, np.zeros(beat[i] * ppb))
-      continue
-
-    # compute frequency exponent
-    e = (note_convert[score[i] % 7] / 12) + (score[i] // 7)
-    if score[i] // 7 == 0: # fix exponent if the note is B
-      e = e - 1
-
-    f = f_base * (2 ** e)             # note frequency
-    t = np.arange(int(beat[i] * ppb)) / fs # time vector
-
-    # amplitude, decays exponentially with time constant
-    # the decay make the sound more realistic
-    A_init = 1
-    A = A_init * np.exp(-t / tc)
-
-    # append note to the music signal
-    note_signal = A * np.cos(2 * np.pi * f * t)
-    music_signal = np.append(music_signal, note_signal)
 
   # generate chord if any
-  # frequency of chord notes are lower 8
-  if len(chord) != 0:
-    # check if chord parameters are valid
-    if len(chord) != len(chord_beat):
-      print('Error: chord and chord_beat have different length,')
-      print('so chord are not generated.')
-    elif sum(chord_beat) != sum(beat):
-      print('Error: beat and chord_beat have different sum,')
-      print('so chord are not generated.')
+  if len(chord) != 0 and not check_chords(beat, chord, chord_beat):
+    chord, chord_beat = [], []
 
-    else:
-      chord_num = len(chord)
-      chord_signal = np.empty(0)
-
-      for i in range(chord_num):
-        chord_size = len(chord[i])              # number of notes in the chords
-        chord_length = int(chord_beat[i] * ppb) # length of the signal (vector)
-
-        if chord_size == 0: # silent note
-          chord_signal = np.append(chord_signal, np.zeros(chord_length))
-          continue
-
-        # time vector
-        t = np.arange(chord_length) / fs
-
-        # amplitude
-        A_init = 0.2   # initial amplitude; smaller than melody
-        A = A_init * np.exp(-t / tc)
-
-        single_chord_signal = np.zeros(chord_length)
-        for j in range(chord_size):
-          # compute frequency exponent
-          e = (note_convert[chord[i][j] % 7] / 12) + (chord[i][j] // 7) - 1
-          if chord[i][j] // 7 == 0: # fix exponent if the note is B
-            e = e - 1
-          f = f_base * (2 ** e)
-          note_signal = A * np.cos(2 * np.pi * f * t)
-          single_chord_signal = single_chord_signal + note_signal
-        
-        chord_signal = np.append(chord_signal, single_chord_signal)
-
-      # add chord into music signal
-      music_signal = music_signal + chord_signal
+  events, total = note_events(score, beat, chord, chord_beat, ppb, f_base)
+
+  if sample_format is not None:
+    # constant memory, whatever the length of the song
+    write_music(f'{name}.wav', events, total, tc, fs, sample_format, block_size)
+    print(f'{name}.wav file is generated successfully.')
+    return
+
+  # every note is written into a slice of one signal of known length
+  music_signal = render_music(events, total, tc, fs)
 
   # write wave file
   # wave module generates noisy wave file, so I use scipy instead
@@ -116,6 +397,7 @@ def numbers_to_music(score, beat, name='music', bpm=180, f_base=524,
   wav_file.writeframes(music_signal.tobytes())
   wav_file.close()
   '''
+  import scipy.io.wavfile as scipy_wav
   scipy_wav.write(f'{name}.wav', fs, music_signal)
   print(f'{name}.wav file is generated successfully.')
 
@@ -6,9 +6,18 @@ import numpy as np
 import math
 import cmath
 import time
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# transform plans are cached by length
+# a plan stores the factorization, index maps and twiddle factors,
+# so repeated transforms of the same length only do the arithmetic
+plan_cache = {}
+
+def get_plan(N):
+  if N in plan_cache:
+    return plan_cache[N]
 
-def prime_factor_dft(x):
-  N = x.size
   p = 0
 
   # find factor of N if any
@@ -17,54 +26,256 @@ def prime_factor_dft(x):
       p = n
       break
 
-  # perform DFT if N is a prime
+  # N is a prime: direct DFT matrix
   if p == 0:
     m = np.arange(N)
     n = np.arange(N).reshape(N, 1)
-    X_matrix = x.reshape(N, 1) * np.exp(complex(0,-1) * 2 * np.pi * m * n / N)
-    X = np.sum(X_matrix, axis=0) # sum along n axis
-    return X
+    W = np.exp(complex(0,-1) * 2 * np.pi * ((m * n) % N) / N)
+    plan = {'type': 'prime', 'N': N, 'W': W}
+    plan_cache[N] = plan
+    return plan
 
   # N is not prime, N = p x q
   q = N // p
+  m = np.arange(p).reshape(p, 1)
+  n = np.arange(q)
 
   # case 1: p is prime to q
   if q % p != 0:
-    m = np.arange(p).reshape(p, 1)
-    n = np.arange(q)
-    G = x[(m*q + n*p) % N]
-    G = G.astype('complex128') # convert data type
-    for i in range(p):
-      G[i,:] = prime_factor_dft(G[i,:])
-    for j in range(q):
-      G[:,j] = prime_factor_dft(G[:,j]).flatten()
-
-    X = np.zeros(N, dtype='complex128')
-    for i in range(p):
-      for j in range(q):
-        n = (i*q + j*p) % N
-        X[n] = G[(i*q) % p, (j*p) % q]
-    return X
+    in_idx = (m*q + n*p) % N
+    # X[(i*q + j*p) % N] = G[(i*q) % p, (j*p) % q]
+    out_idx = np.zeros(N, dtype=int)
+    out_idx[in_idx] = ((m*q) % p) * q + (n*p) % q
+    plan = {'type': 'coprime', 'N': N, 'p': p, 'q': q,
+            'in_idx': in_idx, 'out_idx': out_idx}
 
   # case 2: p is not prime to q
-  # require twiddle factor
-  m = np.arange(p).reshape(p, 1)
-  n = np.arange(q)
-  G = x[(m + n*p) % N]
-  G = G.astype('complex128') # convert data type
-  twiddle = np.exp(complex(0, -1) * 2 * np.pi * m * n / N)
-  for i in range(p):
-    G[i,:] = prime_factor_dft(G[i,:])
-  G *= twiddle
-  for j in range(q):
-    G[:,j] = prime_factor_dft(G[:,j]).flatten()
-
-  X = np.zeros(N, dtype='complex128')
-  for i in range(p):
-    for j in range(q):
-      n = (i*q + j) % N
-      X[n] = G[i,j]
-  return X
+  # require twiddle factor, X[i*q + j] = G[i, j]
+  else:
+    in_idx = (m + n*p) % N
+    twiddle = np.exp(complex(0, -1) * 2 * np.pi * ((m * n) % N) / N)
+    plan = {'type': 'twiddle', 'N': N, 'p': p, 'q': q,
+            'in_idx': in_idx, 'twiddle': twiddle}
+
+  plan['sub_p'] = get_plan(p)
+  plan['sub_q'] = get_plan(q)
+  plan_cache[N] = plan
+  return plan
+
+def run_plan(plan, x):
+  # x: complex array, transform along the last axis
+  if plan['type'] == 'prime':
+    return x @ plan['W']
+
+  N, p, q = plan['N'], plan['p'], plan['q']
+  G = x[..., plan['in_idx']] # shape (..., p, q)
+  G = run_plan(plan['sub_q'], G) # DFT of every row
+  if plan['type'] == 'twiddle':
+    G *= plan['twiddle']
+  G = run_plan(plan['sub_p'], G.swapaxes(-1, -2)).swapaxes(-1, -2) # columns
+  G = G.reshape(x.shape[:-1] + (N,))
+
+  if plan['type'] == 'coprime':
+    return G[..., plan['out_idx']]
+  return G
+
+def prime_factor_dft(x):
+  '''
+  DFT of x along the last axis by prime factor algorithm
+  '''
+  x = np.asarray(x).astype('complex128') # convert data type
+  N = x.shape[-1]
+  return run_plan(get_plan(N), x)
+
+def prime_factor_idft(X):
+  '''
+  inverse DFT of X along the last axis, using the same plans as
+  prime_factor_dft: idft(X) = conj(dft(conj(X))) / N
+  '''
+  X = np.asarray(X).astype('complex128')
+  N = X.shape[-1]
+  return np.conj(run_plan(get_plan(N), np.conj(X))) / N
+
+def get_real_twiddle(N):
+  # twiddle factors W_N^k, k = 0 ... N/2, for even-length real transforms
+  key = ('real', N)
+  if key not in plan_cache:
+    k = np.arange(N // 2 + 1)
+    plan_cache[key] = np.exp(complex(0, -1) * 2 * np.pi * k / N)
+  return plan_cache[key]
+
+def pair_rows(x):
+  # pack real rows in pairs into one complex array: a + jb
+  # if the number of rows is odd, the last row is put at the end unpaired
+  # (pairing it with a zero row costs the same transform, plus unpacking)
+  rows = x.reshape(-1, x.shape[-1])
+  pairs = rows[0:rows.shape[0] - 1:2] + complex(0, 1) * rows[1::2]
+  if rows.shape[0] % 2 == 1:
+    pairs = np.vstack((pairs, rows[-1:]))
+  return pairs
+
+def prime_factor_rdft(x):
+  '''
+  DFT of real x along the last axis
+  returns only the non-redundant half spectrum X[0 ... N//2]
+  '''
+  x = np.asarray(x, dtype='float64')
+  N = x.shape[-1]
+  batch = x.shape[:-1]
+
+  # even N: pack even / odd samples into one complex signal of length N/2
+  #   z[n] = x[2n] + j x[2n+1]
+  #   X[k] = (Z[k] + Z*[N/2-k]) / 2 + W_N^k (Z[k] - Z*[N/2-k]) / 2j
+  if N % 2 == 0 and N > 0:
+    h = N // 2
+    Z = run_plan(get_plan(h), x[..., 0::2] + complex(0, 1) * x[..., 1::2])
+    Z = np.concatenate((Z, Z[..., :1]), axis=-1) # Z[h] = Z[0]
+    Zc = np.conj(Z[..., ::-1]) # Z*[h-k]
+    Xe = (Z + Zc) / 2
+    Xo = (Z - Zc) / complex(0, 2)
+    return Xe + get_real_twiddle(N) * Xo
+
+  # odd N: transform two real rows at once
+  #   z = a + jb, A[k] = (Z[k] + Z*[-k]) / 2, B[k] = (Z[k] - Z*[-k]) / 2j
+  # so the saving needs at least 2 rows; an unpaired row costs the same as
+  # prime_factor_dft, and a single row is transformed as it is
+  rows = math.prod(batch)
+  h = N // 2 + 1
+  if rows == 1:
+    X = run_plan(get_plan(N), x.reshape(N).astype('complex128'))
+    return X[:h].reshape(batch + (h,))
+  p = rows // 2
+  Z = run_plan(get_plan(N), pair_rows(x))
+  Zp = Z[:p, :h]
+  Zc = np.conj(Z[:p, (-np.arange(h)) % N])
+  X = np.empty((rows, h), dtype='complex128')
+  X[0:2*p:2] = (Zp + Zc) / 2
+  X[1:2*p:2] = (Zp - Zc) / complex(0, 2)
+  if rows % 2 == 1:
+    X[-1] = Z[-1, :h]
+  return X.reshape(batch + (h,))
+
+def prime_factor_irdft(X, n=None):
+  '''
+  inverse of prime_factor_rdft
+  X: half spectrum along the last axis
+  n: length of the real output, 2 * (X.shape[-1] - 1) by default
+  the imaginary parts of X[0] (and X[n/2] for even n) are ignored
+  '''
+  X = np.asarray(X).astype('complex128')
+  if n is None:
+    n = 2 * (X.shape[-1] - 1)
+  h = n // 2 + 1
+  batch = X.shape[:-1]
+
+  # keep / zero-pad the half spectrum to n//2 + 1 points
+  if X.shape[-1] < h:
+    X = np.concatenate((X, np.zeros(batch + (h - X.shape[-1],))), axis=-1)
+  X = X[..., :h]
+
+  # even n: undo the even / odd packing of prime_factor_rdft
+  #   Z[k] = Xe[k] + j Xo[k], k = 0 ... n/2 - 1
+  if n % 2 == 0:
+    X[..., 0] = X[..., 0].real # spectrum of real signal
+    X[..., -1] = X[..., -1].real
+    Xc = np.conj(X[..., ::-1]) # X*[n/2-k]
+    Xe = (X + Xc) / 2
+    Xo = (X - Xc) / 2 * np.conj(get_real_twiddle(n))
+    Z = (Xe + complex(0, 1) * Xo)[..., :-1]
+    z = prime_factor_idft(Z)
+    x = np.empty(batch + (n,))
+    x[..., 0::2] = z.real
+    x[..., 1::2] = z.imag
+    return x
+
+  # odd n: rebuild the full spectra and invert two rows at once
+  #   idft(A + jB) = a + jb
+  full = np.concatenate((X, np.conj(X[..., :0:-1])), axis=-1)
+  full[..., 0] = full[..., 0].real # spectrum of real signal
+  # (an unpaired last row is inverted on its own, a single row as it is)
+  rows = math.prod(batch)
+  flat = full.reshape(-1, n)
+  if rows == 1:
+    return prime_factor_idft(flat[0]).real.reshape(batch + (n,))
+  p = rows // 2
+  z = prime_factor_idft(np.vstack((flat[0:2*p:2] + complex(0, 1) * flat[1:2*p:2],
+                                   flat[2*p:])))
+  x = np.empty((rows, n))
+  x[0:2*p:2] = z[:p].real
+  x[1:2*p:2] = z[:p].imag
+  if rows % 2 == 1:
+    x[-1] = z[-1].real
+  return x.reshape(batch + (n,))
+
+def transform_axis(buf, axis, plan, executor, workers):
+  # transform buf along one axis, writing the result back into it
+  # the independent 1-D transforms are split into chunks along the
+  # longest other axis and run on the thread pool
+  view = np.moveaxis(buf, axis, -1)
+  if view.ndim == 1:
+    view[:] = run_plan(plan, view)
+    return
+
+  split_axis = int(np.argmax(view.shape[:-1]))
+  size = view.shape[split_axis]
+  bounds = np.linspace(0, size, min(workers, size) + 1).astype(int)
+
+  def work(start, stop):
+    index = [slice(None)] * view.ndim
+    index[split_axis] = slice(start, stop)
+    index = tuple(index)
+    view[index] = run_plan(plan, view[index])
+
+  futures = [executor.submit(work, bounds[i], bounds[i+1])
+             for i in range(len(bounds) - 1) if bounds[i] < bounds[i+1]]
+  for f in futures:
+    f.result() # re-raise errors from the workers
+
+def prime_factor_dftn(x, axes=None, workers=None, out=None):
+  '''
+  N-dimensional DFT of x by prime factor algorithm
+  axes: axes to transform, all axes by default
+  workers: number of threads, os.cpu_count() by default
+  out: preallocated complex128 buffer with the shape of x, the result is
+       written into it (x may be out itself); run_plan still makes
+       temporaries of every chunk, about the size of the array per axis
+  '''
+  if out is None:
+    out = np.array(x, dtype='complex128')
+  else:
+    if out.shape != np.shape(x) or out.dtype != np.complex128:
+      raise ValueError('out should be a complex128 array with the shape of x')
+    if out is not x:
+      out[...] = x
+
+  if axes is None:
+    axes = range(out.ndim)
+  if workers is None:
+    workers = os.cpu_count() or 1
+
+  # build all plans before starting the threads
+  plans = [(axis, get_plan(out.shape[axis])) for axis in axes]
+
+  with ThreadPoolExecutor(max_workers=workers) as executor:
+    for axis, plan in plans:
+      transform_axis(out, axis, plan, executor, workers)
+  return out
+
+def prime_factor_idftn(X, axes=None, workers=None, out=None):
+  '''
+  inverse of prime_factor_dftn, same arguments
+  '''
+  if out is None:
+    out = np.array(X, dtype='complex128')
+  elif out is not X:
+    out[...] = X
+  np.conj(out, out=out)
+  prime_factor_dftn(out, axes, workers, out)
+  np.conj(out, out=out)
+  if axes is None:
+    axes = range(out.ndim)
+  out /= np.prod([out.shape[axis] for axis in axes])
+  return out
 
 # test
 if __name__ == '__main__':
@@ -72,19 +283,19 @@ if __name__ == '__main__':
   N = x.size
 
   # perform DFT directly
-  t1 = time.time()
+  t1 = time.perf_counter()
   m = np.arange(N)
   n = np.arange(N).reshape(N, 1)
   X_matrix = x.reshape(N, 1) * np.exp(complex(0,-1) * 2 * np.pi * m * n / N)
   X_dir = np.sum(X_matrix, axis=0) # sum along n axis
-  t2 = time.time()
+  t2 = time.perf_counter()
   t_dir = t2 - t1
   print(f'time required for direct DFT: {t_dir} (s)')
 
   # use prime factor algorithm
-  t3 = time.time()
+  t3 = time.perf_counter()
   X_pr = prime_factor_dft(x)
-  t4 = time.time()
+  t4 = time.perf_counter()
   t_pr = t4 - t3
   print(f'time required for prime factor algorithm: {t_pr} (s)')
   error = np.abs(X_pr - X_dir)
@@ -0,0 +1,237 @@
+# ------------------------------------------------------------
+# Short-time Fourier transform on prime factor DFT plans
+# strided framing, batched transforms, streaming with overlap state
+# ------------------------------------------------------------
+
+import numpy as np
+import time
+from numpy.lib.stride_tricks import sliding_window_view
+
+from prime_factor_dft import prime_factor_rdft, prime_factor_irdft
+
+# windows are cached by (name, length), as the transform plans
+window_cache = {}
+
+def get_window(window, N):
+  '''
+  analysis / synthesis window of length N
+  window: 'hann', 'hamming', 'rect' (periodic versions, which overlap-add
+          to a constant) or an array of length N
+  '''
+  if not isinstance(window, str):
+    window = np.asarray(window, dtype=float)
+    if window.shape != (N,):
+      raise ValueError(f'window should have length {N}')
+    return window
+  key = (window, N)
+  if key not in window_cache:
+    n = np.arange(N)
+    if window == 'hann':
+      w = 0.5 - 0.5 * np.cos(2 * np.pi * n / N)
+    elif window == 'hamming':
+      w = 0.54 - 0.46 * np.cos(2 * np.pi * n / N)
+    elif window == 'rect':
+      w = np.ones(N)
+    else:
+      raise ValueError(f'unknown window {window!r}')
+    w.flags.writeable = False
+    window_cache[key] = w
+  return window_cache[key]
+
+def frames(x, N, hop):
+  '''
+  (..., frames, N) view of the frames of x along the last axis,
+  starting every hop samples (no copy, frames share memory with x)
+  '''
+  x = np.asarray(x)
+  if x.shape[-1] < N:
+    return np.empty(x.shape[:-1] + (0, N), dtype=x.dtype)
+  return sliding_window_view(x, N, axis=-1)[..., ::hop, :]
+
+def overlap_add(y, hop, out):
+  '''
+  add the frames y (..., F, N) into out (..., length) at multiples of hop
+  length should be at least (F + ceil(N/hop) - 1) * hop
+  every frame is cut into ceil(N/hop) segments of hop samples, and the
+  j-th segments of all frames are added at once
+  '''
+  F, N = y.shape[-2:]
+  r = -(-N // hop)
+  blocks = out[..., :(F + r - 1) * hop].reshape(out.shape[:-1] + (F + r - 1, hop))
+  for j in range(r):
+    seg = y[..., j*hop:(j+1)*hop]
+    blocks[..., j:j+F, :seg.shape[-1]] += seg
+  return out
+
+def window_sum(w, hop):
+  # sum of w^2 shifted by multiples of hop, one period of hop samples
+  # (the gain of windowed overlap-add away from the ends)
+  r = -(-w.size // hop)
+  sq = np.zeros(r * hop)
+  sq[:w.size] = w ** 2
+  return sq.reshape(r, hop).sum(axis=0)
+
+def stft(x, N, hop, window='hann'):
+  '''
+  short-time Fourier transform of x along the last axis
+  N: frame length (e.g. 3 x 5 x 7 = 105, for the prime factor algorithm)
+  hop: samples between frame starts
+  all frames are windowed and transformed in one batched call
+  return: (..., frames, N//2 + 1) complex array
+  '''
+  w = get_window(window, N)
+  return prime_factor_rdft(frames(x, N, hop) * w)
+
+def spectrogram(x, N, hop, window='hann'):
+  # power |STFT|^2, (..., frames, N//2 + 1)
+  S = stft(x, N, hop, window)
+  return S.real ** 2 + S.imag ** 2
+
+def istft(S, N, hop, window='hann', length=None):
+  '''
+  inverse of stft by weighted overlap-add: every frame is windowed again,
+  added up, and divided by the sum of the squared windows
+  length: samples of the output, (frames - 1) * hop + N by default
+  samples covered by no frame (or only by zeros of the window) are 0
+  '''
+  w = get_window(window, N)
+  y = prime_factor_irdft(S, N) * w
+  F = y.shape[-2]
+  r = -(-N // hop)
+  out = np.zeros(y.shape[:-2] + ((F + r - 1) * hop,))
+  overlap_add(y, hop, out)
+  norm = np.zeros((F + r - 1) * hop)
+  overlap_add(np.broadcast_to(w ** 2, (F, N)), hop, norm)
+  n = (F - 1) * hop + N if F else 0
+  out, norm = out[..., :n], norm[:n]
+  np.divide(out, norm, out=out, where=norm > 1e-10)
+  out[..., norm <= 1e-10] = 0
+  if length is not None:
+    out = out[..., :length] if length <= n else \
+          np.concatenate((out, np.zeros(out.shape[:-1] + (length - n,))), axis=-1)
+  return out
+
+# ------------------------------------------------------------
+# streaming
+# ------------------------------------------------------------
+
+class STFTStream:
+  '''
+  STFT of an unbounded 1D signal given in chunks of any size
+  N - hop zeros are put before the signal, so that with ISTFTStream every
+  sample is covered by all of its frames and is restored exactly
+  process(chunk) returns the spectra (frames, N//2 + 1) of the frames
+  completed by the chunk; the samples of the unfinished frames are kept
+  flush() ends the signal with zeros and returns the last frames
+  '''
+  def __init__(self, N, hop, window='hann'):
+    if not 0 < hop <= N:
+      raise ValueError('hop should be in 1 ... N')
+    self.N, self.hop = N, hop
+    self.window = get_window(window, N)
+    self.reset()
+
+  def reset(self):
+    self.tail = np.zeros(self.N - self.hop) # samples of unfinished frames
+    self.count = 0                          # frames returned so far
+    self.samples = 0                        # samples of the signal so far
+
+  def process(self, chunk):
+    chunk = np.asarray(chunk, dtype=float)
+    self.samples += chunk.size
+    buffer = np.concatenate((self.tail, chunk))
+    x = frames(buffer, self.N, self.hop)
+    F = x.shape[0]
+    self.tail = buffer[F * self.hop:].copy()
+    self.count += F
+    return prime_factor_rdft(x * self.window)
+
+  def flush(self):
+    # zeros until the last sample of the signal is in all of its frames
+    # (the output of ISTFTStream is then longer than the signal by less
+    # than hop samples, which are zeros)
+    # the tail starts at the first sample not returned by ISTFTStream yet
+    if self.samples == 0:
+      return np.empty((0, self.N // 2 + 1), dtype=complex)
+    F = -(-self.tail.size // self.hop)
+    S = self.process(np.zeros((F - 1) * self.hop + self.N - self.tail.size))
+    self.reset()
+    return S
+
+class ISTFTStream:
+  '''
+  inverse of STFTStream by weighted overlap-add
+  process(S) takes the spectra of the next frames and returns the samples
+  they complete (hop per frame, after the first N - hop padding samples
+  of STFTStream are dropped); the overlap of the last frames with the
+  next ones is kept
+  '''
+  def __init__(self, N, hop, window='hann'):
+    if not 0 < hop <= N:
+      raise ValueError('hop should be in 1 ... N')
+    self.N, self.hop = N, hop
+    self.window = get_window(window, N)
+    self.r = -(-N // hop)
+    norm = window_sum(self.window, hop)
+    if np.min(norm) <= 1e-10:
+      raise ValueError('frames do not overlap enough for this window')
+    self.gain = 1 / norm
+    self.reset()
+
+  def reset(self):
+    self.overlap = np.zeros((self.r - 1) * self.hop) # added to the next frames
+    self.skip = self.N - self.hop                    # padding of STFTStream
+
+  def process(self, S):
+    y = prime_factor_irdft(S, self.N)
+    y *= self.window
+    F = y.shape[0]
+    out = np.zeros((F + self.r - 1) * self.hop)
+    out[:self.overlap.size] = self.overlap
+    overlap_add(y, self.hop, out)
+    done = out[:F * self.hop].reshape(F, self.hop)
+    done *= self.gain
+    self.overlap = out[F * self.hop:]
+    done = done.reshape(-1)
+    if self.skip:
+      n = min(self.skip, done.size)
+      self.skip -= n
+      done = done[n:]
+    return done
+
+if __name__ == '__main__':
+  N, hop = 105, 35 # 3 x 5 x 7, overlap of 2/3
+  x = np.random.randn(2, 44100)
+
+  # against numpy FFT of the same frames
+  t1 = time.perf_counter()
+  S = stft(x, N, hop)
+  t2 = time.perf_counter()
+  S_np = np.fft.rfft(frames(x, N, hop) * get_window('hann', N))
+  t3 = time.perf_counter()
+  print(f'{S.shape[-2]} frames x 2 channels: {(t2 - t1) * 1e3:.2f} ms '
+        f'(numpy {(t3 - t2) * 1e3:.2f} ms), max error {np.max(np.abs(S - S_np)):.2e}')
+
+  # inverse
+  y = istft(S, N, hop, length=x.shape[-1])
+  covered = slice(1, (S.shape[-2] - 1) * hop + N) # the window is 0 at n = 0
+  print(f'istft max error {np.max(np.abs(y[:, covered] - x[:, covered])):.2e}')
+
+  # streaming in chunks of random sizes
+  signal = x[0]
+  analysis, synthesis = STFTStream(N, hop), ISTFTStream(N, hop)
+  rng = np.random.default_rng(0)
+  bounds = np.sort(rng.integers(0, signal.size, 50))
+  out, spectra = [], []
+  for chunk in np.split(signal, bounds):
+    spectra.append(analysis.process(chunk))
+    out.append(synthesis.process(spectra[-1]))
+  spectra.append(analysis.flush())
+  out.append(synthesis.process(spectra[-1]))
+  out = np.concatenate(out)[:signal.size]
+  print(f'stream: {np.concatenate(spectra).shape[0]} frames, '
+        f'reconstruction max error {np.max(np.abs(out - signal)):.2e}')
+
+# ------------------------------
+# end
+# ------------------------------
@@ -0,0 +1,27 @@
+import pytest
+
+from filter_design_cache import DesignCache, canonical_spec, spec_hash
+
+spec = {'type': 'mini_max', 'length': 17, 'passbd': [0, 0.2], 'transbd': [0.2, 0.25],
+        'weight': {'pass': 1, 'stop': 0.6}, 'analog_intv': 1e-4}
+
+def test_default_seed_is_zero():
+  assert spec_hash(spec) == spec_hash(dict(spec, seed=0)) == spec_hash(dict(spec, seed=0.0))
+
+def test_seed_none_is_its_own_key():
+  assert canonical_spec(dict(spec, seed=None))['seed'] is None
+  assert spec_hash(dict(spec, seed=None)) != spec_hash(spec)
+
+def test_cached_designs_are_read_only(tmp_path):
+  cache = DesignCache(cache_dir=tmp_path)
+  # both the designed result (miss) and the cached one (hit)
+  for _ in range(2):
+    with pytest.raises(ValueError):
+      cache.design(spec).taps[0] = 0
+    with pytest.raises(ValueError):
+      cache.hilbert(8)[0] = 0
+  # a restarted cache reads the designs from disk, also read-only
+  cache = DesignCache(cache_dir=tmp_path)
+  with pytest.raises(ValueError):
+    cache.hilbert(8)[0] = 0
+  assert cache.disk_hits == 1
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from fir_filter import FIRFilter, fir_filter, Decimator, Interpolator
+
+rng = np.random.default_rng(0)
+
+def convolve(h, x):
+  # first x.shape[-1] samples of the convolution of every row of x
+  return np.array([np.convolve(h, row)[:x.shape[-1]] for row in x.reshape(-1, x.shape[-1])]
+                  ).reshape(x.shape)
+
+@pytest.mark.parametrize('method', ['direct', 'fft', 'auto'])
+@pytest.mark.parametrize('L', [1, 17, 200])
+def test_fir_filter_matches_convolve(method, L):
+  h, x = rng.standard_normal(L), rng.standard_normal((2, 1000))
+  np.testing.assert_allclose(fir_filter(h, x, method), convolve(h, x), atol=1e-9)
+
+@pytest.mark.parametrize('method, block_size', [('direct', None), ('fft', None), ('fft', 64)])
+def test_streaming_chunks(method, block_size):
+  h, x = rng.standard_normal(40), rng.standard_normal((3, 2000))
+  fir = FIRFilter(h, method, block_size)
+  bounds = [0, 1, 7, 7, 300, 333, 1024, 2000] # chunks shorter and longer than h
+  y = np.concatenate([fir.process(x[:, a:b]) for a, b in zip(bounds, bounds[1:])], axis=-1)
+  np.testing.assert_allclose(y, convolve(h, x), atol=1e-9)
+
+@pytest.mark.parametrize('method', ['direct', 'fft'])
+def test_complex(method):
+  h = rng.standard_normal(50)
+  h_c = h + 1j * rng.standard_normal(50)
+  x = rng.standard_normal((1, 600))
+  x_c = x + 1j * rng.standard_normal((1, 600))
+  for taps, signal in ((h, x_c), (h_c, x), (h_c, x_c)):
+    fir = FIRFilter(taps, method)
+    y = np.concatenate([fir.process(signal[:, :250]), fir.process(signal[:, 250:])], axis=-1)
+    np.testing.assert_allclose(y, convolve(taps, signal), atol=1e-9)
+
+def test_real_then_complex_chunks():
+  # the real spectrum of the filter is replaced once the input turns complex
+  h = rng.standard_normal(30)
+  x = rng.standard_normal(500) + 0j
+  x[250:] += 1j * rng.standard_normal(250)
+  fir = FIRFilter(h, 'fft')
+  y = np.concatenate([fir.process(x[:250].real), fir.process(x[250:])])
+  np.testing.assert_allclose(y, np.convolve(h, x)[:500], atol=1e-9)
+
+def test_decimator_and_interpolator():
+  h, x = rng.standard_normal(31), rng.standard_normal(997)
+  full = np.convolve(h, x)[:x.size]
+  dec = Decimator(h, 3)
+  y = np.concatenate([dec.process(x[:100]), dec.process(x[100:101]), dec.process(x[101:])])
+  np.testing.assert_allclose(y, full[::3], atol=1e-9)
+
+  stuffed = np.zeros(3 * x.size)
+  stuffed[::3] = x
+  inter = Interpolator(h, 3)
+  y = np.concatenate([inter.process(x[:100]), inter.process(x[100:])])
+  np.testing.assert_allclose(y, np.convolve(h, stuffed)[:stuffed.size], atol=1e-9)
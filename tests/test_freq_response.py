@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from freq_response import dtft
+
+def direct_dtft(h, n_fft, center=0):
+  # sum_n h[n] exp(-j 2 pi F (n - center)) at F = m / n_fft, m = 0 ... n_fft-1
+  F = np.arange(n_fft) / n_fft
+  n = np.arange(h.shape[-1]) - center
+  return h @ np.exp(complex(0, -2) * np.pi * np.outer(n, F))
+
+@pytest.mark.parametrize('length, n_fft', [(100, 32), (65, 64), (64, 64), (30, 64)])
+def test_dtft_taps_longer_than_n_fft(length, n_fft):
+  h = np.random.default_rng(0).standard_normal((3, length))
+  expected = direct_dtft(h, n_fft, center=length // 2)
+  np.testing.assert_allclose(dtft(h, n_fft, center=length // 2, cache=False),
+                             expected[..., :n_fft // 2 + 1], atol=1e-9)
+  np.testing.assert_allclose(dtft(h, n_fft, center=length // 2, whole=True, cache=False),
+                             expected, atol=1e-9)
+
+def test_dtft_complex_taps_longer_than_n_fft():
+  rng = np.random.default_rng(1)
+  h = rng.standard_normal(50) + 1j * rng.standard_normal(50)
+  np.testing.assert_allclose(dtft(h, 16, cache=False), direct_dtft(h, 16)[:9], atol=1e-9)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from JPEG import (JPEGCodec, JPEG_compress, Huffman_dec, ycbcr_compress, ycbcr_recover,
+                  dct8x8, idct8x8, qtz)
+
+sizes = [(16, 24), (37, 53), (19, 8)]
+
+def image(l, w):
+  return np.random.default_rng(l * w).integers(0, 256, (l, w, 3)).astype(np.uint8)
+
+def extract_chain(img, mode):
+  # the stages of JPEG_compress / JPEG_extract without the entropy coding
+  y, cb, cr = ycbcr_compress(img, mode)
+  planes = [idct8x8(qtz(qtz(dct8x8(p)), inverse=True), *p.shape) for p in (y, cb, cr)]
+  return ycbcr_recover(*planes, mode)
+
+def codec_symbols(data, blocks):
+  # DC differences and AC terms coded in JPEGCodec bytes
+  _, _, _, _, codes, n = JPEGCodec.header.unpack_from(data, 0)
+  offset = JPEGCodec.header.size
+  table = np.frombuffer(data, dtype='<i2', count=codes, offset=offset)
+  offset += 2 * codes + blocks
+  ranks = np.frombuffer(data, dtype='<u2' if codes > 256 else np.uint8,
+                        count=n, offset=offset)
+  return table[ranks]
+
+@pytest.mark.parametrize('mode', [420, 422, 444])
+@pytest.mark.parametrize('l, w', sizes)
+def test_codec_matches_extract_chain(l, w, mode):
+  img = image(l, w)
+  codec = JPEGCodec(l, w, mode)
+  np.testing.assert_array_equal(codec.decode(codec.encode(img)), extract_chain(img, mode))
+
+@pytest.mark.parametrize('l, w', sizes)
+def test_codec_symbols_match_JPEG_compress(l, w):
+  img = image(l, w)
+  data, code, dim, mode = JPEG_compress(img)
+  codec = JPEGCodec(l, w, mode)
+  blocks = sum(plane.nb for plane in codec.planes)
+  np.testing.assert_array_equal(codec_symbols(codec.encode(img), blocks),
+                                Huffman_dec(data, code))
+
+def test_codec_reuse():
+  # the buffers of one frame do not leak into the next
+  codec = JPEGCodec(37, 53)
+  first = codec.decode(codec.encode(image(37, 53))).copy()
+  codec.decode(codec.encode(np.zeros((37, 53, 3), dtype=np.uint8)))
+  np.testing.assert_array_equal(codec.decode(codec.encode(image(37, 53))), first)
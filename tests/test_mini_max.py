@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from mini_max import sweep_mini_max, ripple_ratio, weighted_error
+
+signal = pytest.importorskip('scipy.signal')
+
+def remez_ripple(spec):
+  # maximum weighted error of scipy's Parks-McClellan design of the spec
+  passbd, transbd, weight = spec['passbd'], spec['transbd'], spec['weight']
+  lowpass = passbd[1] == transbd[0]
+  desired = [1, 0] if lowpass else [0, 1]
+  w = [weight['pass'], weight['stop']] if lowpass else [weight['stop'], weight['pass']]
+  h = signal.remez(spec['length'], [0, transbd[0], transbd[1], 0.5], desired,
+                   weight=w, grid_density=64)
+  k = (spec['length'] - 1) // 2
+  s = np.concatenate((h[k:k+1], 2 * h[k+1:], [0]))
+  F = np.linspace(0, 0.5, 20001)
+  F = np.concatenate((F, transbd))
+  return np.max(np.abs(weighted_error(F, s, passbd, transbd, weight)))
+
+def sweep_specs(highpass):
+  return [dict(length=length, transbd=[0.2, 0.2 + width],
+               passbd=[0.2 + width, 0.5] if highpass else [0, 0.2],
+               weight={'pass': 1, 'stop': 0.6}, analog_intv=1e-4)
+          for length in range(31, 52, 10) for width in [0.05, 0.04, 0.03]]
+
+@pytest.mark.parametrize('highpass', [False, True])
+@pytest.mark.parametrize('warm_start', [False, True])
+def test_sweep_matches_remez(highpass, warm_start):
+  specs = sweep_specs(highpass)
+  sweep = sweep_mini_max(specs, warm_start=warm_start)
+  for spec, design in zip(specs, sweep.designs):
+    assert ripple_ratio(design) < 1.01
+    assert design.ripple == pytest.approx(remez_ripple(spec), rel=5e-3)
+
+def test_warm_start_is_kept():
+  sweep = sweep_mini_max(sweep_specs(highpass=True))
+  assert not sweep.warm[0]
+  assert sum(sweep.warm) >= len(sweep.warm) - 2
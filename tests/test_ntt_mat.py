@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from ntt_mat import ntt_convolve, multiply_digits
+
+@pytest.mark.parametrize('a, b', [([0, 0, 0], [0, 0]), ([0], [5]), ([3, 0, 7], [0])])
+def test_convolve_zero_inputs(a, b):
+  c = ntt_convolve(a, b)
+  assert c.dtype == np.int64
+  np.testing.assert_array_equal(c, np.zeros(len(a) + len(b) - 1, dtype=np.int64))
+
+def test_convolve_matches_numpy():
+  rng = np.random.default_rng(0)
+  a = rng.integers(-1000, 1000, 300)
+  b = rng.integers(-1000, 1000, 77)
+  np.testing.assert_array_equal(ntt_convolve(a, b), np.convolve(a, b))
+
+def test_multiply_digits_zero():
+  np.testing.assert_array_equal(multiply_digits([0], [5]), [0])
+  np.testing.assert_array_equal(multiply_digits([0, 0], [5, 1]), [0])
+
+def test_multiply_digits():
+  rng = np.random.default_rng(1)
+  a, b = rng.integers(0, 10, 40), rng.integers(0, 10, 25)
+  to_int = lambda digits: int(''.join(map(str, digits[::-1])))
+  assert to_int(multiply_digits(a, b)) == to_int(a) * to_int(b)
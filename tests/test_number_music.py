@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from number_music import (WaveformCache, render_music, render_blocks, note_events, peak_bound,
+                          write_music, MusicRenderer)
+
+fs, tc = 8000, 0.5
+
+def test_long_note_with_small_cache():
+  # a note 8 times larger than the cache: synthesized per block, not in full
+  events = [(0, 2**14, [440.0, 550.0], 1.0), (100, 500, [330.0], 0.2),
+            (3000, 500, [330.0], 0.2)]
+  total = 2**14
+  cache = WaveformCache(max_bytes=2**14)
+  blocks = [block.copy() for block in render_blocks(events, total, tc, fs, 1024, cache)]
+  np.testing.assert_allclose(np.concatenate(blocks),
+                             render_music(events, total, tc, fs, cache=None), atol=1e-9)
+  # only the short chord went through the cache: one miss, then hits
+  # (the second one spans two blocks)
+  assert cache.stats()['misses'] == 1
+  assert cache.stats()['hits'] == 2
+  assert cache.bytes <= cache.max_bytes
+
+score = [1, 2, 3, 0, 5, 5.5, 6, 1]
+beat = [1, 0.5, 0.5, 1, 1, 0.5, 1.5, 2]
+chord = [[1, 3, 5], [], [4, 6, 1], [5]]
+chord_beat = [2, 1, 3, 2]
+ppb = int(60 / 180 * fs)
+
+def test_render_music_cache():
+  # cached waveforms give the same signal as synthesizing every note
+  events, total = note_events(score, beat, chord, chord_beat, ppb, 524)
+  cache = WaveformCache()
+  expected = render_music(events, total, tc, fs, cache=None)
+  for _ in range(2):
+    np.testing.assert_allclose(render_music(events, total, tc, fs, cache), expected, atol=1e-12)
+  assert cache.stats()['hits'] > 0
+
+@pytest.mark.parametrize('block_size', [1000, 4096, 100000])
+def test_render_blocks(block_size):
+  events, total = note_events(score, beat, chord, chord_beat, ppb, 524)
+  blocks = [block.copy() for block in render_blocks(events, total, tc, fs, block_size, None)]
+  assert all(block.size == block_size for block in blocks[:-1])
+  np.testing.assert_allclose(np.concatenate(blocks),
+                             render_music(events, total, tc, fs, cache=None), atol=1e-12)
+
+@pytest.mark.parametrize('sample_format, dtype, step',
+                         [('int16', '<i2', 1 / 32767), ('float32', '<f4', 1e-7)])
+def test_write_music(tmp_path, sample_format, dtype, step):
+  events, total = note_events(score, beat, chord, chord_beat, ppb, 524)
+  path = tmp_path / 'music.wav'
+  write_music(path, events, total, tc, fs, sample_format, block_size=1000, cache=None)
+  data = path.read_bytes()
+  offset = data.index(b'data') + 8
+  assert int.from_bytes(data[offset-4:offset], 'little') == len(data) - offset
+  samples = np.frombuffer(data, dtype=dtype, offset=offset)
+  if sample_format == 'int16':
+    samples = samples / 32767
+  expected = render_music(events, total, tc, fs, cache=None) / peak_bound(events)
+  np.testing.assert_allclose(samples, expected, atol=step)
+
+def test_music_renderer():
+  renderer = MusicRenderer(score, beat, chord=chord, chord_beat=chord_beat, tc=tc, fs=fs,
+                           max_frames=512)
+  events, total = note_events(score, beat, chord, chord_beat, ppb, 524)
+  assert renderer.total == total
+  out = []
+  sizes = [1, 512, 100, 0, 333]
+  while not renderer.finished:
+    out.append(renderer.render(sizes[len(out) % len(sizes)]).copy())
+  out = np.concatenate(out)
+  np.testing.assert_allclose(out[:total],
+                             render_music(events, total, tc, fs, cache=None) / peak_bound(events),
+                             atol=1e-9)
+  assert not out[total:].any()
+  assert not renderer.render(512).any() # silence after the end
+  with pytest.raises(ValueError):
+    renderer.render(513)
+
+  # rendered again from the beginning after reset
+  renderer.reset()
+  np.testing.assert_allclose(renderer.render(512), out[:512], atol=1e-12)
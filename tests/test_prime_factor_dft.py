@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from prime_factor_dft import (prime_factor_dft, prime_factor_idft, prime_factor_rdft,
+                              prime_factor_irdft, prime_factor_dftn, prime_factor_idftn)
+
+rng = np.random.default_rng(0)
+
+lengths = [2, 7, 15, 16, 30, 97, 105, 210]
+batches = [(), (1,), (3,), (2, 4)]
+
+@pytest.mark.parametrize('N', lengths)
+def test_dft_matches_numpy(N):
+  x = rng.standard_normal((3, N)) + 1j * rng.standard_normal((3, N))
+  np.testing.assert_allclose(prime_factor_dft(x), np.fft.fft(x), atol=1e-9)
+  np.testing.assert_allclose(prime_factor_idft(x), np.fft.ifft(x), atol=1e-9)
+
+@pytest.mark.parametrize('batch', batches)
+@pytest.mark.parametrize('N', lengths)
+def test_rdft_matches_numpy(N, batch):
+  x = rng.standard_normal(batch + (N,))
+  X = prime_factor_rdft(x)
+  assert X.shape == batch + (N // 2 + 1,)
+  np.testing.assert_allclose(X, np.fft.rfft(x), atol=1e-9)
+  np.testing.assert_allclose(prime_factor_irdft(X, N), x, atol=1e-9)
+
+@pytest.mark.parametrize('batch', batches)
+@pytest.mark.parametrize('n', [14, 15, 30, 31, 40])
+def test_irdft_matches_numpy(n, batch):
+  # half spectra of 16 points, cut or zero-padded to n output samples
+  X = rng.standard_normal(batch + (16,)) + 1j * rng.standard_normal(batch + (16,))
+  np.testing.assert_allclose(prime_factor_irdft(X, n), np.fft.irfft(X, n), atol=1e-9)
+  np.testing.assert_allclose(prime_factor_irdft(X), np.fft.irfft(X), atol=1e-9)
+
+@pytest.mark.parametrize('axes', [None, (0,), (1, 2), (2, 0)])
+@pytest.mark.parametrize('workers', [1, 3])
+def test_dftn_matches_numpy(axes, workers):
+  x = rng.standard_normal((15, 8, 21)) + 1j * rng.standard_normal((15, 8, 21))
+  X = prime_factor_dftn(x, axes, workers)
+  np.testing.assert_allclose(X, np.fft.fftn(x, axes=axes), atol=1e-8)
+  np.testing.assert_allclose(prime_factor_idftn(X, axes, workers), x, atol=1e-9)
+
+def test_dftn_out():
+  x = rng.standard_normal((12, 35))
+  expected = np.fft.fftn(x)
+  out = np.empty(x.shape, dtype=complex)
+  assert prime_factor_dftn(x, out=out) is out
+  np.testing.assert_allclose(out, expected, atol=1e-9)
+  # out may be the input itself
+  y = x.astype(complex)
+  assert prime_factor_dftn(y, out=y) is y
+  np.testing.assert_allclose(y, expected, atol=1e-9)
+  with pytest.raises(ValueError):
+    prime_factor_dftn(x, out=np.empty(x.shape))
+
+def test_dftn_1d():
+  x = rng.standard_normal(105)
+  np.testing.assert_allclose(prime_factor_dftn(x), np.fft.fft(x), atol=1e-9)
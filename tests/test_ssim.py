@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from SSIM import SSIM, SSIM_dct, SSIM_dct_blocks
+from JPEG import dct8x8, idct8x8, qtz
+
+c1 = c2 = 1 / 16
+
+def images(l, w):
+  rng = np.random.default_rng(l * w)
+  A = rng.uniform(0, 255, (l, w))
+  B = np.clip(A + rng.normal(0, 30, (l, w)), 0, 255)
+  return A, B
+
+def padded(A):
+  # image as seen by dct8x8: edge blocks filled with zeros
+  P = np.zeros((-(-A.shape[0] // 8) * 8, -(-A.shape[1] // 8) * 8))
+  P[:A.shape[0], :A.shape[1]] = A
+  return P
+
+@pytest.mark.parametrize('l, w', [(32, 48), (37, 53)])
+def test_SSIM_dct_matches_SSIM(l, w):
+  A, B = images(l, w)
+  X, Y = dct8x8(A), dct8x8(B)
+  l8, w8 = l // 8 * 8, w // 8 * 8
+  assert SSIM_dct(X, Y, c1, c2) == pytest.approx(SSIM(padded(A), padded(B), c1, c2), rel=1e-9)
+  assert SSIM_dct(X, Y, c1, c2, (l, w)) == pytest.approx(
+    SSIM(A[:l8, :w8], B[:l8, :w8], c1, c2), rel=1e-9)
+
+def test_SSIM_dct_of_JPEG_coefficients():
+  # the dequantized coefficients against the inverse DCT of them
+  A, _ = images(37, 53)
+  X = dct8x8(A)
+  X_iq = qtz(qtz(X), inverse=True)
+  A_rec = idct8x8(X_iq, *A.shape)
+  assert SSIM_dct(X, X_iq, c1, c2, A.shape) == pytest.approx(
+    SSIM(A[:32, :48], A_rec[:32, :48], c1, c2), rel=1e-9)
+
+def test_SSIM_dct_blocks():
+  A, B = images(37, 53)
+  blocks = SSIM_dct_blocks(dct8x8(A), dct8x8(B), c1, c2, A.shape)
+  assert blocks.shape == (4, 6)
+  expected = [[SSIM(A[i:i+8, j:j+8], B[i:i+8, j:j+8], c1, c2) for j in range(0, 48, 8)]
+              for i in range(0, 32, 8)]
+  np.testing.assert_allclose(blocks, expected, rtol=1e-9)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from stft import stft, istft, frames, get_window, STFTStream, ISTFTStream
+
+rng = np.random.default_rng(0)
+
+@pytest.mark.parametrize('N, hop', [(105, 35), (64, 16), (15, 15)])
+def test_stft_matches_numpy(N, hop):
+  x = rng.standard_normal((2, 3000))
+  S = stft(x, N, hop)
+  np.testing.assert_allclose(S, np.fft.rfft(frames(x, N, hop) * get_window('hann', N)),
+                             atol=1e-9)
+
+@pytest.mark.parametrize('N, hop, window', [(105, 35, 'hann'), (64, 16, 'hamming'),
+                                            (15, 15, 'rect'), (30, 7, 'hann')])
+def test_istft_round_trip(N, hop, window):
+  x = rng.standard_normal((2, 3000))
+  S = stft(x, N, hop, window)
+  y = istft(S, N, hop, window, length=x.shape[-1])
+  assert y.shape == x.shape
+  # covered by a frame, and not only by the zero of the hann window at n = 0
+  covered = slice(1 if window == 'hann' else 0, (S.shape[-2] - 1) * hop + N)
+  np.testing.assert_allclose(y[:, covered], x[:, covered], atol=1e-9)
+  assert not y[:, covered.stop:].any()
+
+def stream(x, N, hop, bounds, window='hann'):
+  analysis, synthesis = STFTStream(N, hop, window), ISTFTStream(N, hop, window)
+  spectra, out = [], []
+  for chunk in np.split(x, bounds):
+    spectra.append(analysis.process(chunk))
+    out.append(synthesis.process(spectra[-1]))
+  spectra.append(analysis.flush())
+  out.append(synthesis.process(spectra[-1]))
+  return np.concatenate(spectra), np.concatenate(out)
+
+@pytest.mark.parametrize('N, hop, window', [(105, 35, 'hann'), (64, 16, 'hamming'),
+                                            (15, 15, 'rect'), (30, 7, 'hann')])
+def test_stream_round_trip(N, hop, window):
+  x = rng.standard_normal(3000)
+  bounds = [0, 1, 1, 10, 500, 501, 1234, 2999] # empty and one-sample chunks
+  S, y = stream(x, N, hop, bounds, window)
+  # the frames of the stream are those of x with N - hop zeros before it
+  expected = stft(np.concatenate((np.zeros(N - hop), x)), N, hop, window)
+  np.testing.assert_allclose(S[:len(expected)], expected, atol=1e-9)
+  # every sample is restored, followed by less than hop zeros
+  assert x.size <= y.size < x.size + hop
+  np.testing.assert_allclose(y, np.concatenate((x, np.zeros(y.size - x.size))), atol=1e-9)
+
+def test_stream_chunking_does_not_matter():
+  x = rng.standard_normal(2000)
+  S1, y1 = stream(x, 105, 35, [])
+  S2, y2 = stream(x, 105, 35, np.arange(7, 2000, 7))
+  np.testing.assert_allclose(S1, S2, atol=1e-9)
+  np.testing.assert_allclose(y1, y2, atol=1e-9)
+
+def test_stream_reuse_after_flush():
+  x = rng.standard_normal(700)
+  analysis, synthesis = STFTStream(64, 16), ISTFTStream(64, 16)
+  S = np.concatenate((analysis.process(x), analysis.flush()))
+  np.concatenate((analysis.process(x), analysis.flush()))
+  S_again = np.concatenate((analysis.process(x), analysis.flush()))
+  np.testing.assert_allclose(S_again, S, atol=1e-12)
+  y = synthesis.process(S)
+  np.testing.assert_allclose(y[:x.size], x, atol=1e-9)